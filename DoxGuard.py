@@ -5,16 +5,566 @@
     Обнаруживает номера телефонов, банковские карты, паспорта и ФИО, наказывая нарушителей баном или мутом.
 """
 
-version = (1, 0, 3)
+version = (1, 9, 0)
 
 # meta developer: @sxozuo
 # meta pic: https://img.icons8.com/fluency/160/shield-with-check-mark.png
 # scope: coddrago_only
 
+import asyncio
+import bisect
+import itertools
+import json
+import logging
 import re
+import time
+from collections import Counter, OrderedDict, deque
 from datetime import timedelta
+from typing import Dict, List, NamedTuple, Optional, Tuple
+try:
+    from re import _compiler as sre_compile, _parser as sre_parse
+except ImportError:  # Python < 3.11
+    import sre_compile
+    import sre_parse
+from herokutl import events
+from herokutl.errors import ChannelPrivateError, ChatAdminRequiredError, FloodWaitError
+from herokutl.tl.types import (
+    ChannelParticipantAdmin,
+    ChannelParticipantCreator,
+    ChannelParticipantsAdmins,
+    ChatParticipantAdmin,
+    ChatParticipantCreator,
+    PeerChannel,
+    UpdateChannelParticipant,
+    UpdateChatParticipantAdmin,
+)
+from herokutl.utils import get_peer_id
 from .. import loader, utils
 
+logger = logging.getLogger(__name__)
+
+ADMIN_TYPES = (ChannelParticipantAdmin, ChannelParticipantCreator, ChatParticipantAdmin, ChatParticipantCreator)
+ADMIN_CACHE_TTL = 600
+# Список админов не получен из-за временной ошибки: повтор через ADMIN_RETRY_DELAY, а не через весь TTL.
+# FloodWait не длиннее ADMIN_FLOOD_WAIT выжидается на месте — все срабатывания чата ждут один запрос
+ADMIN_RETRY_DELAY = 30
+ADMIN_FLOOD_WAIT = 30
+FLOOD_RETRIES = 3
+VERDICT_CACHE_SIZE = 512
+MESSAGE_VERSIONS_SIZE = 4096
+LATENCY_SAMPLES = 256
+DELETE_CHUNK = 100
+
+# Защита от ReDoS держится на двух вещах: встроенные паттерны линейны (без вложенных
+# квантификаторов), а текст длиннее MAX_SCAN_LENGTH регуляркой не сканируется вовсе — вместо
+# пропуска сообщения работает линейный токенизатор fallback_scan. Бюджет времени не поможет:
+# re не отпускает GIL во время поиска, и прервать его из цикла событий нельзя.
+# Порог ниже лимита Telegram (4096 символов): при равном ему ни одно сообщение его не превысит
+MAX_SCAN_LENGTH = 1024
+# Свои паттерны чата линейность не гарантируют, поэтому ищутся в окнах по CUSTOM_WINDOW символов
+# с перекрытием CUSTOM_OVERLAP — и в обычном скане, и в запасном: длинный текст не прячет
+# совпадение за набивкой. Совпадение не длиннее перекрытия целиком попадает хотя бы в одно окно
+CUSTOM_WINDOW = 256
+CUSTOM_OVERLAP = 128
+# Окно не спасает от перебора, растущего с длиной быстрее квадрата, поэтому такие паттерны
+# отклоняются еще при добавлении: повтор длиннее CUSTOM_REPEAT_LIMIT с повтором переменной длины
+# или альтернативой внутри и длинные повторы подряд, которые могут делить между собой одни и те же
+# символы. Пересечение классов символов проверяется на PROBE_CHARS (латиница, кириллица, пунктуация)
+CUSTOM_REPEAT_LIMIT = 16
+PROBE_CHARS = "".join(map(chr, itertools.chain(range(0x500), range(0x2000, 0x2070))))
+
+# Паттерны записаны «после первого символа»: общий класс PII_FIRST_CHARS стоит в начале выражения,
+# поэтому sre ищет кандидатов быстрым поиском по набору символов, а не пробует все ветки в каждой
+# позиции. \b перед первым символом выражена как (?<!\w.). Порядок важен: при совпадении в одной
+# позиции побеждает более ранняя категория.
+PII_FIRST_CHARS = r"[\d+А-ЯЁ]"
+PII_PATTERNS = [
+    ("card", r"(?<=\d)(?<!\w.)\d{3}[ -]?\d{4}[ -]?\d{4}[ -]?\d{4}\b"),
+    ("passport", r"(?<=\d)(?<!\w.)\d[ ]?\d{2}[ ]?\d{6}\b"),
+    ("ip", r"(?<=\d)(?<!\w.)\d{0,2}\.\d{1,3}\.\d{1,3}\.\d{1,3}\b"),
+    ("phone", r"(?:(?<=\+)\d[\s\-\(\)]?|(?<=\d)[\s\-\(\)]?)(?:\+?\d[\s\-\(\)]?){9,14}"),
+    ("fio", r"(?<=[А-ЯЁ])(?<!\w.)[а-яёё]+\s+[А-ЯЁ][а-яёё]+(?:\s+[А-ЯЁ][а-яёё]+)?\b"),
+]
+
+# Линейные выражения для запасного токенизатора: без вложенных квантификаторов
+DIGIT_RUN = re.compile(r"\+?\d(?:[\s\-\(\)\.]?\d)*")
+CAPITALIZED_WORD = re.compile(r"[А-ЯЁ][а-яё]+")
+PASSPORT_RUN = re.compile(r"\d{2} ?\d{2} ?\d{6}")
+# Разделители внутри номера телефона при подсчете длины серии цифр вокруг совпадения.
+# Серии (цифры через одиночный разделитель) находятся одним линейным проходом на текст,
+# и все совпадения внутри одной серии используют ее границы
+PHONE_SEPARATORS = " \t\n-()"
+PHONE_RUN = re.compile(r"\d(?:[ \t\n\-\(\)]?\d)*")
+
+CATEGORY_MODES = {"card": "ban", "passport": "ban", "ip": "ban", "phone": "ban", "fio": "mute"}
+ACTIONS = ("ban", "mute", "off")
+
+
+class Hit(NamedTuple):
+    category: str
+    start: int
+    end: int
+
+
+class DoxScanner:
+    """Все категории ПДн одним скомпилированным регулярным выражением — один проход по тексту"""
+
+    def __init__(self, patterns=PII_PATTERNS):
+        self._regex = self._compile(patterns)
+        others = [p for p in patterns if p[0] != "phone"]
+        # Без других категорий досматривать нечего: пустая альтернатива совпала бы с любым символом
+        self._no_phone = self._compile(others) if others else None
+
+    @staticmethod
+    def _compile(patterns):
+        # Пустая именованная группа в конце ветки — метка категории для match.lastgroup
+        return re.compile(PII_FIRST_CHARS + "(?:" + "|".join(f"{pattern}(?P<{name}>)" for name, pattern in patterns) + ")")
+
+    @staticmethod
+    def _hits(regex, text: str) -> List[Hit]:
+        return [Hit(m.lastgroup, m.start(), m.end()) for m in regex.finditer(text)]
+
+    def scan(self, text: str) -> List[Hit]:
+        hits = self._hits(self._regex, text)
+        runs = self.phone_runs(text) if any(hit.category == "phone" for hit in hits) else None
+        valid = [hit for hit in hits if self.validate(text, hit, runs)]
+        if len(valid) < len(hits):
+            kept = set(valid)
+            if any(hit.category == "phone" and hit not in kept for hit in hits):
+                # Отброшенный телефон мог поглотить номер карты или паспорта, поэтому такой текст
+                # досматриваем без телефона, сохранив прошедшие проверку телефоны
+                valid = [hit for hit in valid if hit.category == "phone"]
+                if self._no_phone:
+                    valid = sorted(valid + [hit for hit in self._hits(self._no_phone, text) if self.validate(text, hit)])
+        return valid
+
+    @staticmethod
+    def luhn(digits: str) -> bool:
+        total = 0
+        for i, c in enumerate(reversed(digits)):
+            d = int(c) * (2 if i % 2 else 1)
+            total += d - 9 if d > 9 else d
+        return total % 10 == 0
+
+    @staticmethod
+    def phone_runs(text: str) -> Tuple[List[int], List[int], List[int]]:
+        """Начала и концы серий PHONE_RUN по возрастанию и префиксные суммы цифр текста"""
+        starts, ends = [], []
+        for m in PHONE_RUN.finditer(text):
+            starts.append(m.start())
+            ends.append(m.end())
+        return starts, ends, [0, *itertools.accumulate(map(str.isdigit, text))]
+
+    @staticmethod
+    def phone_digits(text: str, runs, start: int, end: int) -> int:
+        """Число цифр в совпадении [start, end), продолженном на примыкающие к нему серии"""
+        starts, ends, prefix = runs
+
+        def run_at(index: int) -> int:
+            return bisect.bisect_right(ends, index)
+
+        if start > 0 and text[start - 1].isdigit():
+            start = starts[run_at(start - 1)]
+        elif start > 1 and text[start - 1] in PHONE_SEPARATORS and text[start - 2].isdigit():
+            start = starts[run_at(start - 2)]
+        if end < len(text) and text[end].isdigit():
+            end = ends[run_at(end)]
+        elif end + 1 < len(text) and text[end] in PHONE_SEPARATORS and text[end + 1].isdigit():
+            end = ends[run_at(end + 1)]
+        return prefix[end] - prefix[start]
+
+    def validate(self, text: str, hit: Hit, runs=None) -> bool:
+        """Дешевая проверка совпадения перед наказанием: Луна для карт, октеты для IP,
+        длина всей серии цифр для телефона. Паспорт и ФИО проверять нечем"""
+        span = text[hit.start:hit.end]
+        if hit.category == "card":
+            return self.luhn("".join(filter(str.isdigit, span)))
+        if hit.category == "ip":
+            return all(int(octet) <= 255 for octet in span.split("."))
+        if hit.category == "phone":
+            return 10 <= self.phone_digits(text, runs or self.phone_runs(text), hit.start, hit.end) <= 15
+        return True
+
+    @staticmethod
+    def _is_word_char(text: str, index: int) -> bool:
+        return 0 <= index < len(text) and (text[index].isalnum() or text[index] == "_")
+
+    def fallback_scan(self, text: str) -> List[Hit]:
+        """Линейная проверка тех же правил по серийным цифрам и словам с заглавной буквы"""
+        hits = []
+        for m in DIGIT_RUN.finditer(text):
+            run = m.group()
+            digits = sum(c.isdigit() for c in run)
+            parts = run.split(".")
+            if len(parts) == 4 and all(1 <= len(part) <= 3 and part.isdigit() for part in parts):
+                if all(int(part) <= 255 for part in parts):
+                    hits.append(Hit("ip", m.start(), m.end()))
+            elif digits == 16:
+                if self.luhn("".join(filter(str.isdigit, run))):
+                    hits.append(Hit("card", m.start(), m.end()))
+            elif digits == 10 and PASSPORT_RUN.fullmatch(run):
+                hits.append(Hit("passport", m.start(), m.end()))
+            elif 10 <= digits <= 15:
+                hits.append(Hit("phone", m.start(), m.end()))
+
+        prev = None
+        for m in CAPITALIZED_WORD.finditer(text):
+            if self._is_word_char(text, m.start() - 1) or self._is_word_char(text, m.end()):
+                prev = None
+                continue
+            if prev and text[prev.end():m.start()].isspace():
+                hits.append(Hit("fio", prev.start(), m.end()))
+            prev = m
+        return hits
+
+
+def check_pattern(pattern: str):
+    """Бросает re.error для неверной регулярки и ValueError для такой, что разгоняется подбором текста"""
+    parsed = sre_parse.parse(pattern)
+
+    def chars(items, flags: int) -> frozenset:
+        # Символы односимвольного фрагмента; у многосимвольного считаем, что он пересекается со всем
+        if items.getwidth() != (1, 1):
+            return frozenset(PROBE_CHARS)
+        regex = sre_compile.compile(items, flags)
+        return frozenset(c for c in PROBE_CHARS if regex.fullmatch(c))
+
+    def walk(items, repeated: bool, tail: frozenset, flags: int = 0) -> frozenset:
+        """tail — символы, которые еще могут съесть открытые длинные повторы перед текущим местом.
+        flags — флаги групп (?i:...) вокруг фрагмента; снятые флаги не учитываются, это только строже"""
+        for op, av in items:
+            name = op.name
+            if name in ("MAX_REPEAT", "MIN_REPEAT", "POSSESSIVE_REPEAT"):
+                low, high, body = av
+                if repeated and low != high:
+                    raise ValueError("вложенный повтор переменной длины, например (a+)+")
+                long = high > CUSTOM_REPEAT_LIMIT
+                walk(body, repeated or long, frozenset(), flags)
+                body_chars = chars(body, flags)
+                if long and low != high:
+                    if tail & body_chars:
+                        raise ValueError("соседние повторы делят одни символы, например \\d+\\d+ или .*.*")
+                    # Необязательный повтор не закрывает предыдущие: они могут встретиться напрямую
+                    tail = tail | body_chars if low == 0 else body_chars
+                elif low and not tail & body_chars:
+                    tail = frozenset()
+            elif name == "BRANCH":
+                if repeated:
+                    raise ValueError("альтернатива внутри повтора, например (a|aa)+")
+                tail = frozenset().union(*(walk(branch, repeated, tail, flags) for branch in av[1]))
+            elif name == "SUBPATTERN":
+                tail = walk(av[-1], repeated, tail, flags | av[1])
+            elif name == "ATOMIC_GROUP":
+                tail = walk(av, repeated, tail, flags)
+            elif name in ("ASSERT", "ASSERT_NOT"):
+                walk(av[1], repeated, frozenset(), flags)
+            elif name == "GROUPREF_EXISTS":
+                tail = frozenset().union(*(walk(branch, repeated, tail, flags) for branch in av[1:] if branch))
+            elif tail and not tail & chars(sre_parse.SubPattern(parsed.state, [(op, av)]), flags):
+                # Обязательный символ, которого открытые повторы съесть не могут, их закрывает
+                tail = frozenset()
+        return tail
+
+    walk(parsed, False, frozenset())
+
+
+class ChatMatcher:
+    """Скомпилированный профиль чата: включенные категории, их действия и свои паттерны.
+
+    Профиль: {"actions": {категория: "ban" | "mute" | "off"}, "custom": [{"pattern": ..., "action": ...}]}
+    """
+
+    def __init__(self, profile: dict):
+        self.actions = {**CATEGORY_MODES, **profile.get("actions", {})}
+        enabled = [p for p in PII_PATTERNS if self.actions[p[0]] != "off"]
+        self._scanner = DoxScanner(enabled) if enabled else None
+
+        # Номер своего паттерна -> причина, по которой он не применяется (сохранен до проверки)
+        self.rejected: Dict[int, str] = {}
+        custom = []
+        for i, rule in enumerate(profile.get("custom", [])):
+            self.actions[f"custom{i}"] = rule["action"]
+            try:
+                check_pattern(rule["pattern"])
+            except (re.error, ValueError) as e:
+                logger.warning(f"DoxGuard skips custom pattern {rule['pattern']!r}: {e}")
+                self.rejected[i] = str(e)
+                continue
+            custom.append(f"(?:{rule['pattern']})(?P<custom{i}>)")
+        # Пользовательские паттерны не переписать под общий первый символ, поэтому отдельное выражение
+        self._custom = re.compile("|".join(custom)) if custom else None
+
+    def scan(self, text: str) -> List[Hit]:
+        hits = self._scanner.scan(text) if self._scanner else []
+        return hits + self._custom_hits(text) if self._custom else hits
+
+    def fallback_scan(self, text: str) -> List[Hit]:
+        hits = self._scanner.fallback_scan(text) if self._scanner else []
+        return hits + self._custom_hits(text) if self._custom else hits
+
+    def _custom_hits(self, text: str) -> List[Hit]:
+        # pos/endpos вместо среза: lookbehind и \b видят символы до начала окна
+        found: Dict[int, Hit] = {}
+        for pos in range(0, max(len(text) - CUSTOM_OVERLAP, 1), CUSTOM_WINDOW - CUSTOM_OVERLAP):
+            for m in self._custom.finditer(text, pos, pos + CUSTOM_WINDOW):
+                # Следующее окно видит больше текста справа — из совпадений с одним началом берем длиннейшее
+                if m.start() not in found or found[m.start()].end < m.end():
+                    found[m.start()] = Hit(m.lastgroup, m.start(), m.end())
+        return sorted(found.values(), key=lambda hit: hit.start)
+
+    def verdict(self, hits) -> Optional[str]:
+        modes = {self.actions[hit.category] for hit in hits}
+        return "ban" if "ban" in modes else "mute" if "mute" in modes else None
+
+
+class VerdictCache:
+    """LRU отпечатков сообщений по чатам. Повтор уже виденного текста (в том числе чистого)
+    классифицируется одним поиском в словаре вместо полного прохода регулярки"""
+
+    def __init__(self, size: int = VERDICT_CACHE_SIZE):
+        self.size = size
+        self.hits = 0
+        self.misses = 0
+        self._chats: Dict[int, "OrderedDict[int, Tuple[Hit, ...]]"] = {}
+
+    @staticmethod
+    def fingerprint(text: str) -> int:
+        # Пробелы по краям не влияют на вердикт; hash() строки кэшируется на самом объекте
+        return hash(text.strip())
+
+    def get(self, chat_id: int, key: int) -> Optional[Tuple[Hit, ...]]:
+        lru = self._chats.get(chat_id)
+        verdict = lru.get(key) if lru else None
+        if verdict is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        lru.move_to_end(key)
+        return verdict
+
+    def put(self, chat_id: int, key: int, verdict: Tuple[Hit, ...]):
+        lru = self._chats.setdefault(chat_id, OrderedDict())
+        lru[key] = verdict
+        if len(lru) > self.size:
+            lru.popitem(last=False)
+
+    def clear(self, chat_id: Optional[int] = None):
+        if chat_id is None:
+            self._chats.clear()
+        else:
+            self._chats.pop(chat_id, None)
+
+
+class MessageVersions:
+    """Отпечаток последнего просканированного текста по (chat_id, msg_id). Правка, не менявшая
+    текст (реакции, форматирование, повторная доставка), повторно не сканируется"""
+
+    def __init__(self, size: int = MESSAGE_VERSIONS_SIZE):
+        self.size = size
+        self.skipped = 0
+        self._seen: "OrderedDict[Tuple[int, int], int]" = OrderedDict()
+
+    def changed(self, chat_id: int, msg_id: int, key: int) -> bool:
+        """Запоминает версию и возвращает True, если текст сообщения новый или изменился"""
+        seen = (chat_id, msg_id)
+        if self._seen.get(seen) == key:
+            self.skipped += 1
+            self._seen.move_to_end(seen)
+            return False
+        self._seen[seen] = key
+        self._seen.move_to_end(seen)
+        if len(self._seen) > self.size:
+            self._seen.popitem(last=False)
+        return True
+
+    def clear(self, chat_id: Optional[int] = None):
+        if chat_id is None:
+            self._seen.clear()
+        else:
+            self._seen = OrderedDict((k, v) for k, v in self._seen.items() if k[0] != chat_id)
+
+
+class AdminCache:
+    """Списки админов по чатам с TTL. Параллельные запросы одного чата схлопываются в один"""
+
+    def __init__(self, client, ttl: int = ADMIN_CACHE_TTL):
+        self._client = client
+        self.ttl = ttl
+        # chat_id -> (истекает, id админов); None — список недоступен, спрашиваем точечно
+        self._rosters: Dict[int, tuple] = {}
+        self._inflight: Dict[int, asyncio.Task] = {}
+
+    def invalidate(self, chat_id: int):
+        self._rosters.pop(chat_id, None)
+
+    async def is_admin(self, chat_id: int, user_id: int) -> bool:
+        roster = self._rosters.get(chat_id)
+        if not roster or roster[0] < time.monotonic():
+            admins = await self._fetch(chat_id)
+        else:
+            admins = roster[1]
+
+        if admins is None:
+            p = await self._client.get_permissions(chat_id, user_id)
+            return p.is_admin or p.is_creator
+        return user_id in admins
+
+    async def _fetch(self, chat_id: int) -> Optional[frozenset]:
+        task = self._inflight.get(chat_id)
+        if task is None:
+            task = self._inflight[chat_id] = asyncio.ensure_future(self._load(chat_id))
+            task.add_done_callback(lambda _: self._inflight.pop(chat_id, None))
+        return await asyncio.shield(task)
+
+    async def _load(self, chat_id: int) -> Optional[frozenset]:
+        for attempt in range(FLOOD_RETRIES):
+            try:
+                users = await self._client.get_participants(chat_id, filter=ChannelParticipantsAdmins)
+                admins = frozenset(u.id for u in users if isinstance(getattr(u, "participant", None), ADMIN_TYPES))
+                ttl = self.ttl
+            except FloodWaitError as e:
+                if e.seconds <= ADMIN_FLOOD_WAIT and attempt + 1 < FLOOD_RETRIES:
+                    await asyncio.sleep(e.seconds + 1)
+                    continue
+                admins, ttl = None, max(e.seconds + 1, ADMIN_RETRY_DELAY)
+            except (ChatAdminRequiredError, ChannelPrivateError):
+                # Список закрыт насовсем — до конца TTL спрашиваем права точечно
+                admins, ttl = None, self.ttl
+            except Exception as e:
+                logger.warning(f"DoxGuard get_participants failed in {chat_id}: {e}")
+                admins, ttl = None, ADMIN_RETRY_DELAY
+            break
+        self._rosters[chat_id] = (time.monotonic() + ttl, admins)
+        return admins
+
+
+class ChatStats:
+    """Счетчики патруля одного чата с момента загрузки модуля или .doxstats reset"""
+
+    __slots__ = ("scanned", "scan_time", "hits", "api_calls", "api_errors", "api_time", "punish_latency")
+
+    def __init__(self):
+        self.scanned = 0
+        self.scan_time = 0.0
+        self.hits = Counter()
+        self.api_calls = Counter()
+        self.api_errors = Counter()
+        self.api_time = 0.0
+        # Секунды от постановки в очередь до удаления сообщения, последние LATENCY_SAMPLES
+        self.punish_latency = deque(maxlen=LATENCY_SAMPLES)
+
+    def latency(self, share: float) -> Optional[float]:
+        if not self.punish_latency:
+            return None
+        ordered = sorted(self.punish_latency)
+        return ordered[min(len(ordered) - 1, int(len(ordered) * share))]
+
+
+class DoxStats(dict):
+    """chat_id -> ChatStats, создается при первом обращении"""
+
+    def __missing__(self, chat_id: int) -> ChatStats:
+        stats = self[chat_id] = ChatStats()
+        return stats
+
+
+class PunishBatch:
+    __slots__ = ("message_ids", "queued", "offenders")
+
+    def __init__(self):
+        self.message_ids: List[int] = []
+        self.queued: List[float] = []
+        # user_id -> [имя, режим]; бан перекрывает мут
+        self.offenders: Dict[int, list] = {}
+
+
+class PunishQueue:
+    """Очередь наказаний по чатам.
+
+    Первое нарушение обрабатывается сразу, а все, что приходит, пока идут API-вызовы,
+    копится и уходит следующей пачкой: одно delete_messages, одно ограничение на нарушителя
+    и одно сводное сообщение. FloodWait выжидается, действие повторяется.
+    """
+
+    def __init__(self, client, stats: DoxStats):
+        self._client = client
+        self._stats = stats
+        self._batches: Dict[int, PunishBatch] = {}
+        self._workers: Dict[int, asyncio.Task] = {}
+
+    def add(self, chat_id: int, message_id: int, user_id: int, name: str, mode: str):
+        batch = self._batches.setdefault(chat_id, PunishBatch())
+        batch.message_ids.append(message_id)
+        batch.queued.append(time.monotonic())
+        offender = batch.offenders.setdefault(user_id, [name, mode])
+        if mode == "ban":
+            offender[1] = "ban"
+
+        if chat_id not in self._workers:
+            self._workers[chat_id] = asyncio.ensure_future(self._drain(chat_id))
+
+    async def _drain(self, chat_id: int):
+        try:
+            while chat_id in self._batches:
+                await self._apply(chat_id, self._batches.pop(chat_id))
+        finally:
+            self._workers.pop(chat_id, None)
+
+    async def close(self):
+        """Отменяет воркеры чатов и дожидается их завершения"""
+        workers = list(self._workers.values())
+        for task in workers:
+            task.cancel()
+        await asyncio.gather(*workers, return_exceptions=True)
+
+    async def _call(self, chat_id: int, func, *args, **kwargs) -> bool:
+        stats = self._stats[chat_id]
+        for attempt in range(FLOOD_RETRIES):
+            stats.api_calls[func.__name__] += 1
+            started = time.perf_counter()
+            try:
+                await func(*args, **kwargs)
+                return True
+            except FloodWaitError as e:
+                stats.api_errors["FloodWait"] += 1
+                logger.warning(f"DoxGuard FloodWait {e.seconds}s on {func.__name__}")
+                wait = e.seconds + 1
+            except Exception as e:
+                stats.api_errors[func.__name__] += 1
+                logger.warning(f"DoxGuard {func.__name__} failed: {e}")
+                return False
+            finally:
+                stats.api_time += time.perf_counter() - started
+            # После последней попытки ждать незачем — действие все равно не повторится
+            if attempt + 1 < FLOOD_RETRIES:
+                await asyncio.sleep(wait)
+        return False
+
+    async def _apply(self, chat_id: int, batch: PunishBatch):
+        latency = self._stats[chat_id].punish_latency
+        for i in range(0, len(batch.message_ids), DELETE_CHUNK):
+            await self._call(chat_id, self._client.delete_messages, chat_id, batch.message_ids[i:i + DELETE_CHUNK])
+            now = time.monotonic()
+            latency.extend(now - queued for queued in batch.queued[i:i + DELETE_CHUNK])
+
+        lines = []
+        for user_id, (name, mode) in batch.offenders.items():
+            if mode == "ban":
+                done = await self._call(chat_id, self._client.edit_permissions, chat_id, user_id, view_messages=False)
+                status = "в <b>ЧЕРНОМ СПИСОКЕ</b> ❌."
+            else:
+                done = await self._call(chat_id, self._client.edit_permissions, chat_id, user_id, until_date=timedelta(days=1), send_messages=False)
+                status = "в <b>МУТЕ</b> (24ч) за ФИО."
+            if done:
+                lines.append(f"Пользователь <a href='tg://user?id={user_id}'>{utils.escape_html(name)}</a> {status}")
+
+        if len(lines) == 1:
+            await self._call(chat_id, self._client.send_message, chat_id, f"<b>[DoxGuard]</b> {lines[0]}")
+        elif lines:
+            text = f"<b>[DoxGuard]</b> Удалено сообщений: <b>{len(batch.message_ids)}</b>\n" + "\n".join(f"• {line}" for line in lines)
+            await self._call(chat_id, self._client.send_message, chat_id, text)
+
+
 @loader.tds
 class DoxGuardMod(loader.Module):
     """🛡️ Патрулирование чатов и защита от слива персональных данных (телефоны, карты, ФИО)."""
@@ -29,13 +579,67 @@ class DoxGuardMod(loader.Module):
         if self.db.get("DoxGuard", "active_chats") is None:
             self.db.set("DoxGuard", "active_chats", [])
 
-        self.phone_pattern = r"(?:\+?\d[\s\-\(\)]?){10,15}"
-        self.other_ban = [
-            r"\b\d{4}[ -]?\d{4}[ -]?\d{4}[ -]?\d{4}\b",
-            r"\b\d{2}[ ]?\d{2}[ ]?\d{6}\b",
-            r"\b\d{1,3}\.\d{1,3}\.\d{1,3}\.\d{1,3}\b"
-        ]
-        self.fio_pattern = r"\b[А-ЯЁ][а-яёё]+\s+[А-ЯЁ][а-яёё]+(?:\s+[А-ЯЁ][а-яёё]+)?\b"
+        # Watcher отсекает чужие чаты по set в памяти, без обращения к БД и без await
+        self.active_chats = set(self.db.get("DoxGuard", "active_chats", []))
+        self.me_id = (await client.get_me()).id
+
+        self.profiles = self.db.get("DoxGuard", "profiles", {})
+        # chat_id -> матчер; одинаковые профили делят один скомпилированный объект
+        self._matchers: Dict[int, ChatMatcher] = {}
+        self._compiled: Dict[str, ChatMatcher] = {}
+        self.verdicts = VerdictCache()
+        self.versions = MessageVersions()
+        self.scan_stats = Counter()
+        self.stats = DoxStats()
+
+        self.admins = AdminCache(client)
+        self.punishments = PunishQueue(client, self.stats)
+        self.client.add_event_handler(
+            self._on_admin_update,
+            events.Raw([UpdateChannelParticipant, UpdateChatParticipantAdmin]),
+        )
+        # Watcher'ы не получают правки сообщений, поэтому их слушаем отдельно
+        self.client.add_event_handler(self._on_edit, events.MessageEdited())
+
+    async def on_unload(self):
+        self.client.remove_event_handler(self._on_admin_update)
+        self.client.remove_event_handler(self._on_edit)
+        await self.punishments.close()
+
+    def _matcher(self, chat_id: int) -> ChatMatcher:
+        matcher = self._matchers.get(chat_id)
+        if matcher is None:
+            profile = self.profiles.get(str(chat_id), {})
+            key = json.dumps(profile, sort_keys=True)
+            matcher = self._compiled.get(key)
+            if matcher is None:
+                matcher = self._compiled[key] = ChatMatcher(profile)
+            self._matchers[chat_id] = matcher
+        return matcher
+
+    def _save_profile(self, chat_id: int, profile: dict):
+        if profile.get("actions") or profile.get("custom"):
+            self.profiles[str(chat_id)] = profile
+        else:
+            self.profiles.pop(str(chat_id), None)
+        self.db.set("DoxGuard", "profiles", self.profiles)
+        self._matchers.pop(chat_id, None)
+        self.verdicts.clear(chat_id)
+        self.versions.clear(chat_id)
+        live = {json.dumps(p, sort_keys=True) for p in self.profiles.values()} | {"{}"}
+        self._compiled = {k: v for k, v in self._compiled.items() if k in live}
+
+    def _scan(self, matcher: ChatMatcher, text: str) -> List[Hit]:
+        if len(text) > MAX_SCAN_LENGTH:
+            self.scan_stats["oversized"] += 1
+            return matcher.fallback_scan(text)
+        return matcher.scan(text)
+
+    async def _on_admin_update(self, update):
+        if isinstance(update, UpdateChatParticipantAdmin):
+            self.admins.invalidate(-update.chat_id)
+        elif isinstance(update.prev_participant, ADMIN_TYPES) or isinstance(update.new_participant, ADMIN_TYPES):
+            self.admins.invalidate(get_peer_id(PeerChannel(update.channel_id)))
 
     @loader.command()
     async def doxg(self, message):
@@ -43,17 +647,123 @@ class DoxGuardMod(loader.Module):
         if message.is_private: 
             return await utils.answer(message, "<b>[DoxGuard]</b> Команда работает только в чатах/каналах.")
         
-        chats = self.db.get("DoxGuard", "active_chats", [])
-        if message.chat_id in chats:
-            chats.remove(message.chat_id)
+        if message.chat_id in self.active_chats:
+            self.active_chats.discard(message.chat_id)
+            self.verdicts.clear(message.chat_id)
+            self.versions.clear(message.chat_id)
             res = "<b>[DoxGuard]</b> Патруль <b>ВЫКЛЮЧЕН</b>. ⚠️"
         else:
-            chats.append(message.chat_id)
+            self.active_chats.add(message.chat_id)
             res = "<b>[DoxGuard]</b> Патруль <b>ВКЛЮЧЕН</b>. 🛡"
         
-        self.db.set("DoxGuard", "active_chats", chats)
+        self.db.set("DoxGuard", "active_chats", list(self.active_chats))
         await utils.answer(message, res)
 
+    @loader.command()
+    async def doxrule(self, message):
+        """[категория ban/mute/off | reset] — Показать или изменить правила патруля в этом чате"""
+        if message.is_private: 
+            return await utils.answer(message, "<b>[DoxGuard]</b> Команда работает только в чатах/каналах.")
+
+        args = utils.get_args_raw(message).split()
+        profile = dict(self.profiles.get(str(message.chat_id), {}))
+
+        if args == ["reset"]:
+            self._save_profile(message.chat_id, {})
+            return await utils.answer(message, "<b>[DoxGuard]</b> Правила чата сброшены по умолчанию.")
+
+        if len(args) == 2:
+            category, action = args[0].lower(), args[1].lower()
+            if category not in CATEGORY_MODES or action not in ACTIONS:
+                return await utils.answer(
+                    message,
+                    f"<b>[DoxGuard]</b> Категории: <code>{', '.join(CATEGORY_MODES)}</code>, действия: <code>{', '.join(ACTIONS)}</code>.",
+                )
+            actions = {k: v for k, v in profile.get("actions", {}).items() if k != category}
+            if action != CATEGORY_MODES[category]:
+                actions[category] = action
+            profile["actions"] = actions
+            self._save_profile(message.chat_id, profile)
+
+        matcher = self._matcher(message.chat_id)
+        lines = [f"• <code>{category}</code> — <b>{matcher.actions[category]}</b>" for category in CATEGORY_MODES]
+        lines += [
+            f"• <code>#{i} {utils.escape_html(rule['pattern'])}</code> — <b>{rule['action']}</b>"
+            + (f" (отключен: {utils.escape_html(matcher.rejected[i])})" if i in matcher.rejected else "")
+            for i, rule in enumerate(self.profiles.get(str(message.chat_id), {}).get("custom", []))
+        ]
+        await utils.answer(message, "<b>[DoxGuard]</b> Правила чата:\n" + "\n".join(lines))
+
+    @loader.command()
+    async def doxpattern(self, message):
+        """<ban/mute> <регулярка> | del <номер> — Добавить или удалить свой паттерн в этом чате"""
+        if message.is_private: 
+            return await utils.answer(message, "<b>[DoxGuard]</b> Команда работает только в чатах/каналах.")
+
+        args = utils.get_args_raw(message).split(maxsplit=1)
+        profile = dict(self.profiles.get(str(message.chat_id), {}))
+        custom = list(profile.get("custom", []))
+
+        if len(args) == 2 and args[0] == "del" and args[1].isdigit() and int(args[1]) < len(custom):
+            custom.pop(int(args[1]))
+        elif len(args) == 2 and args[0] in ("ban", "mute"):
+            try:
+                check_pattern(args[1])
+                ChatMatcher({"custom": custom + [{"pattern": args[1], "action": args[0]}]})
+            except re.error as e:
+                return await utils.answer(message, f"<b>[DoxGuard]</b> Неверная регулярка: <code>{utils.escape_html(str(e))}</code>")
+            except ValueError as e:
+                return await utils.answer(message, f"<b>[DoxGuard]</b> Паттерн отклонен, его можно замедлить подобранным текстом: {utils.escape_html(str(e))}.")
+            custom.append({"pattern": args[1], "action": args[0]})
+        else:
+            return await utils.answer(message, "<b>[DoxGuard]</b> Использование: <code>.doxpattern ban|mute регулярка</code> или <code>.doxpattern del номер</code>")
+
+        profile["custom"] = custom
+        self._save_profile(message.chat_id, profile)
+        await utils.answer(message, f"<b>[DoxGuard]</b> Своих паттернов в чате: <b>{len(custom)}</b>.")
+
+    @loader.command()
+    async def doxstats(self, message):
+        """[reset] — Статистика патруля в этом чате (в ЛС — по всем чатам)"""
+        if utils.get_args_raw(message).strip() == "reset":
+            if message.is_private:
+                self.stats.clear()
+                self.scan_stats.clear()
+            else:
+                self.stats.pop(message.chat_id, None)
+            return await utils.answer(message, "<b>[DoxGuard]</b> Статистика сброшена.")
+
+        chats = list(self.stats.values()) if message.is_private else [self.stats[message.chat_id]]
+        total = ChatStats()
+        for chat in chats:
+            total.scanned += chat.scanned
+            total.scan_time += chat.scan_time
+            total.hits.update(chat.hits)
+            total.api_calls.update(chat.api_calls)
+            total.api_errors.update(chat.api_errors)
+            total.api_time += chat.api_time
+            total.punish_latency.extend(chat.punish_latency)
+
+        def counts(counter: Counter) -> str:
+            return ", ".join(f"{name} {count}" for name, count in counter.most_common()) or "нет"
+
+        p50, p99 = total.latency(0.5), total.latency(0.99)
+        latency = f"p50 {p50:.2f} с, p99 {p99:.2f} с" if p50 is not None else "нет данных"
+        lines = [
+            f"<b>[DoxGuard]</b> Статистика {'всех чатов' if message.is_private else 'чата'}:",
+            f"• Просканировано: <b>{total.scanned}</b> (регулярки {total.scan_time * 1000:.0f} мс)",
+            f"• Срабатывания: {counts(total.hits)}",
+            f"• Задержка наказания: {latency}",
+            f"• API: {counts(total.api_calls)} ({total.api_time:.1f} с)",
+            f"• Ошибки API: {counts(total.api_errors)}",
+        ]
+        if message.is_private:
+            lines.append(
+                f"• Кэш вердиктов: {self.verdicts.hits}/{self.verdicts.misses}, правок пропущено: {self.versions.skipped}, "
+                f"длинных: {self.scan_stats['oversized']}"
+            )
+        await utils.answer(message, "\n".join(lines))
+
     @loader.command()
     async def gub(self, message):
         """Разбанить пользователя (убрать из ЧС)"""
@@ -102,55 +812,56 @@ class DoxGuardMod(loader.Module):
         except: 
             return await utils.answer(message, "Ошибка: У меня недостаточно прав! ❌")
 
+    @staticmethod
+    def _message_text(message) -> str:
+        """Текст или подпись к медиа без разметки плюс скрытые ссылки из entities"""
+        text = message.raw_text or ""
+        urls = [entity.url for entity in message.entities or () if getattr(entity, "url", None)]
+        return "\n".join([text, *urls]) if urls else text
+
+    async def _on_edit(self, event):
+        await self.watcher(event.message)
+
     async def watcher(self, message):
-        chats = self.db.get("DoxGuard", "active_chats", [])
-        if message.is_private or message.chat_id not in chats or not message.text: 
+        if message.chat_id not in self.active_chats or message.is_private: 
             return
         
-        me = await self.client.get_me()
-        if message.sender_id == me.id: 
+        if message.sender_id == self.me_id: 
+            return
+
+        text = self._message_text(message)
+        if not text:
             return
 
-        text = message.text
-        hit, mode = False, "mute"
+        key = self.verdicts.fingerprint(text)
+        if not self.versions.changed(message.chat_id, message.id, key):
+            return
 
-        if re.search(self.phone_pattern, text):
-            digits = "".join(filter(str.isdigit, text))
-            if 10 <= len(digits) <= 15: 
-                hit, mode = True, "ban"
-        
-        if not hit:
-            for p in self.other_ban:
-                if re.search(p, text): 
-                    hit, mode = True, "ban"
-                    break
-        
-        if not hit and re.search(self.fio_pattern, text): 
-            hit, mode = True, "mute"
+        matcher = self._matcher(message.chat_id)
+        stats = self.stats[message.chat_id]
+        stats.scanned += 1
+        hits = self.verdicts.get(message.chat_id, key)
+        if hits is None:
+            started = time.perf_counter()
+            hits = tuple(self._scan(matcher, text))
+            stats.scan_time += time.perf_counter() - started
+            self.verdicts.put(message.chat_id, key, hits)
+        mode = matcher.verdict(hits)
+        # Сообщения с совпадением по категории, а не число совпадений в тексте
+        stats.hits.update({hit.category for hit in hits if matcher.actions[hit.category] != "off"})
 
-        if hit:
+        if mode:
             try:
-                p = await self.client.get_permissions(message.chat_id, message.sender_id)
-                if p.is_admin or p.is_creator: 
+                if await self.admins.is_admin(message.chat_id, message.sender_id): 
                     return
                 await self.punish(message, mode)
             except: 
                 pass
 
     async def punish(self, message, mode):
-        user = await message.get_sender()
+        user = message.sender or await message.get_sender()
         name = user.first_name if user.first_name else "Юзер"
-        try:
-            await message.delete()
-            if mode == "ban":
-                await self.client.edit_permissions(message.chat_id, user.id, view_messages=False)
-                await message.respond(f"<b>[DoxGuard]</b> Пользователь <a href='tg://user?id={user.id}'>{name}</a> в <b>ЧЕРНОМ СПИСОКЕ</b> ❌.")
-            else:
-                if message.is_group:
-                    await self.client.edit_permissions(message.chat_id, user.id, until_date=timedelta(days=1), send_messages=False)
-                    await message.respond(f"<b>[DoxGuard]</b> Пользователь <a href='tg://user?id={user.id}'>{name}</a> в <b>МУТЕ</b> (24ч) за ФИО.")
-                else:
-                    await self.client.edit_permissions(message.chat_id, user.id, view_messages=False)
-                    await message.respond(f"<b>[DoxGuard]</b> Пользователь <a href='tg://user?id={user.id}'>{name}</a> в <b>ЧЕРНОМ СПИСОКЕ</b> ❌.")
-        except: 
-            pass
\ No newline at end of file
+        # В каналах мута нет — там за ФИО тоже ЧС
+        if mode == "mute" and not message.is_group:
+            mode = "ban"
+        self.punishments.add(message.chat_id, message.id, user.id, name, mode)
@@ -12,11 +12,170 @@
 
 import logging
 import asyncio
+import bisect
+import heapq
+import time
+from collections import Counter, OrderedDict, deque
+from typing import Optional
 from .. import loader, utils
+from herokutl.errors import FloodWaitError
 from herokutl.types import Message
 
 logger = logging.getLogger(__name__)
 
+OWN_IDS_PER_CHAT = 64
+OWN_IDS_CHATS = 512
+# Окно, за которое упоминания одного чата снимаются одним send_read_acknowledge
+ACK_DELAY = 1.0
+ACK_RETRIES = 3
+# Через сколько секунд авто-ответ удаляется; удаления одного чата в пределах DELETE_BATCH_WINDOW
+# уходят одним delete_messages
+REPLY_TTL = 5
+DELETE_BATCH_WINDOW = 1.0
+DELETE_CHUNK = 100
+DELETE_RETRIES = 3
+# Токен-бакеты авто-ответов: запас и пополнение в секунду на чат и на отправителя
+CHAT_REPLY_BURST = 3
+CHAT_REPLY_RATE = 1 / 30
+SENDER_REPLY_BURST = 2
+SENDER_REPLY_RATE = 1 / 120
+REPLY_BUCKETS_LIMIT = 4096
+# Лимит длины одного сообщения Telegram с запасом под разметку
+DIGEST_MESSAGE_LIMIT = 4000
+DIGEST_TEXT_LIMIT = 120
+# Кэш отображаемых имен: записей на пользователей и на чаты, и их срок жизни в секундах.
+# Запись — пара коротких строк, так что предел в несколько сотен КБ на кэш
+ENTITY_CACHE_SIZE = 2048
+ENTITY_CACHE_TTL = 3600
+
+
+class OwnMessages:
+    """Недавние id своих сообщений по чатам, чтобы узнать реплай нам без get_reply_message.
+
+    Id сообщений в чате растут, поэтому с первого увиденного в чате id все свои сообщения
+    известны: реплай на более новое и не свое сообщение — точно не нам. Про более старые
+    (и вытесненные) сообщения решить нельзя, тогда is_own возвращает None.
+    """
+
+    def __init__(self, per_chat: int = OWN_IDS_PER_CHAT, chats: int = OWN_IDS_CHATS):
+        self.per_chat = per_chat
+        self.chats = chats
+        # chat_id -> [с какого id чат отслеживается, set id, deque id в порядке добавления]
+        self._chats: "OrderedDict[int, list]" = OrderedDict()
+
+    def _chat(self, chat_id: int, msg_id: int) -> list:
+        chat = self._chats.get(chat_id)
+        if chat is None:
+            chat = self._chats[chat_id] = [msg_id, set(), deque()]
+            if len(self._chats) > self.chats:
+                self._chats.popitem(last=False)
+        else:
+            self._chats.move_to_end(chat_id)
+        return chat
+
+    def observe(self, chat_id: int, msg_id: int):
+        self._chat(chat_id, msg_id)
+
+    def add(self, chat_id: int, msg_id: int):
+        chat = self._chat(chat_id, msg_id)
+        if msg_id in chat[1]:
+            return
+        chat[1].add(msg_id)
+        chat[2].append(msg_id)
+        if len(chat[2]) > self.per_chat:
+            evicted = chat[2].popleft()
+            chat[1].discard(evicted)
+            chat[0] = max(chat[0], evicted + 1)
+
+    def is_own(self, chat_id: int, msg_id: int) -> Optional[bool]:
+        chat = self._chats.get(chat_id)
+        if chat is None:
+            return None
+        if msg_id in chat[1]:
+            return True
+        return False if msg_id >= chat[0] else None
+
+
+class DisplayCache:
+    """LRU с TTL для имен пользователей и названий чатов, уже экранированных под HTML"""
+
+    def __init__(self, size: int = ENTITY_CACHE_SIZE, ttl: int = ENTITY_CACHE_TTL):
+        self.size = size
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._entries: "OrderedDict[int, tuple]" = OrderedDict()
+
+    def get(self, key: int):
+        entry = self._entries.get(key)
+        if entry is None or entry[0] < time.monotonic():
+            self.misses += 1
+            return None
+        self.hits += 1
+        self._entries.move_to_end(key)
+        return entry[1]
+
+    def put(self, key: int, value):
+        self._entries[key] = (time.monotonic() + self.ttl, value)
+        self._entries.move_to_end(key)
+        if len(self._entries) > self.size:
+            self._entries.popitem(last=False)
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+class ReplyLimiter:
+    """Токен-бакеты по ключу: ключ -> (токены, время обновления).
+
+    Полный бакет равен отсутствующему, поэтому при переполнении словаря выкидываются
+    восполнившиеся записи, и память растет только с числом недавно активных ключей.
+    """
+
+    def __init__(self, burst: int, rate: float, limit: int = REPLY_BUCKETS_LIMIT):
+        self.burst = burst
+        self.rate = rate
+        self.limit = limit
+        self._buckets = {}
+
+    def _tokens(self, key: int, now: float) -> float:
+        tokens, stamp = self._buckets.get(key, (self.burst, now))
+        return min(self.burst, tokens + (now - stamp) * self.rate)
+
+    def allows(self, key: int, now: float) -> bool:
+        return self._tokens(key, now) >= 1
+
+    def take(self, key: int, now: float):
+        self._buckets[key] = (self._tokens(key, now) - 1, now)
+        if len(self._buckets) > self.limit:
+            self._buckets = {k: v for k, v in self._buckets.items() if self._tokens(k, now) < self.burst}
+
+
+class LatencyHistogram:
+    """Гистограмма времени с геометрическими корзинами от 1 мкс с шагом √2: запись — один bisect"""
+
+    BOUNDS = tuple(1e-6 * 2 ** (i / 2) for i in range(61))
+
+    def __init__(self):
+        self.counts = [0] * (len(self.BOUNDS) + 1)
+        self.total = 0
+
+    def add(self, seconds: float):
+        self.counts[bisect.bisect_left(self.BOUNDS, seconds)] += 1
+        self.total += 1
+
+    def percentile(self, share: float) -> Optional[float]:
+        """Верхняя граница корзины, в которую попадает доля share записей"""
+        if not self.total:
+            return None
+        rank = share * self.total
+        seen = 0
+        for i, count in enumerate(self.counts):
+            seen += count
+            if seen >= rank:
+                return self.BOUNDS[min(i, len(self.BOUNDS) - 1)]
+
+
 @loader.tds
 class SilentTagsMod(loader.Module):
     """Авто-ответ на упоминания, логирование и очистка уведомлений (@)"""
@@ -33,84 +192,402 @@ class SilentTagsMod(loader.Module):
             "<b>📍 Чат:</b> {chat_title}\n"
             "<b>🔗 Ссылка:</b> <a href='{link}'>Перейти к сообщению</a>"
         ),
+        "reply_suppressed": "\n<i>🔇 Авто-ответ не отправлен: лимит ответов.</i>",
+        "digest_header": "<b>🔔 Пингов за период: {count}</b>",
+        "digest_suppressed": " <i>(без авто-ответа: {count})</i>",
+        "digest_chat": "\n<b>📍 {chat_title}</b> ({count})",
+        "digest_entry": "• {name} ({username}): <a href='{link}'>{text}</a>",
+        "digest_entry_suppressed": "• 🔇 {name} ({username}): <a href='{link}'>{text}</a>",
         "status_on": "<b>✅ SilentTags включен. Все входящие упоминания теперь обрабатываются скрытно.</b>",
-        "status_off": "<b>❌ SilentTags выключен.</b>"
+        "status_off": "<b>❌ SilentTags выключен.</b>",
+        "stats": (
+            "<b>📊 SilentTags</b>\n\n"
+            "<b>Сообщений:</b> {seen}, отсеяно префильтром: {rejected}, запросов реплая: {reply_fetches}\n"
+            "<b>Пингов:</b> {pings}, авто-ответов: {replies}, подавлено лимитом: {suppressed}\n"
+            "<b>Префильтр:</b> p50 {prefilter_p50}, p99 {prefilter_p99}\n"
+            "<b>После префильтра:</b> p50 {ping_p50}, p99 {ping_p99}\n"
+            "<b>API:</b> {api}\n"
+            "<b>Кэш имен:</b> {cache_hits}/{cache_misses}"
+        ),
+        "stats_reset": "<b>📊 Статистика SilentTags сброшена.</b>",
+        "cfg_digest": "Собирать пинги в сводку вместо отдельного лога на каждый",
+        "cfg_digest_interval": "Как часто отправлять сводку, секунд",
+        "cfg_digest_size": "Отправить сводку раньше, если накопилось столько пингов",
     }
 
+    def __init__(self):
+        self.config = loader.ModuleConfig(
+            loader.ConfigValue("digest", False, lambda: self.strings("cfg_digest"), validator=loader.validators.Boolean()),
+            loader.ConfigValue("digest_interval", 300, lambda: self.strings("cfg_digest_interval"), validator=loader.validators.Integer(minimum=10)),
+            loader.ConfigValue("digest_size", 20, lambda: self.strings("cfg_digest_size"), validator=loader.validators.Integer(minimum=1)),
+        )
+
     async def client_ready(self, client, db):
         self._client = client
         self._db = db
         self._me = await client.get_me()
         if self._db.get("SilentTags", "state") is None:
             self._db.set("SilentTags", "state", True)
+        # Watcher не ходит в БД на каждое сообщение: состояние держим в памяти
+        self._enabled = self._db.get("SilentTags", "state")
+        self._own = OwnMessages()
+        self._chat_replies = ReplyLimiter(CHAT_REPLY_BURST, CHAT_REPLY_RATE)
+        self._sender_replies = ReplyLimiter(SENDER_REPLY_BURST, SENDER_REPLY_RATE)
+        # user_id -> (имя, юзернейм) и chat_id -> название, общие для всех вызовов watcher
+        self._users = DisplayCache()
+        self._chats = DisplayCache()
+        self._reset_stats()
+        # chat_id -> [peer, максимальный id пинга]; задача отложенного прочтения на чат
+        self._ack_pending = {}
+        self._ack_tasks = {}
+        # chat_id -> [название чата, записи пингов]; порядок чатов — порядок первого пинга
+        self._digest = {}
+        self._digest_count = 0
+        # Единственная задача сводки; _digest_now будит ее раньше интервала, при выгрузке она не ждет
+        self._digest_task = None
+        self._digest_now = asyncio.Event()
+        self._digest_closing = False
+
+        # Куча (срок по time.time(), chat_id, msg_id) авто-ответов на удаление; переживает перезапуск
+        self._deletions = [tuple(item) for item in self._db.get("SilentTags", "deletions", [])]
+        heapq.heapify(self._deletions)
+        self._deletions_changed = asyncio.Event()
+        self._deleter_task = asyncio.ensure_future(self._deleter())
+
+    async def on_unload(self):
+        # Дожидаемся finally удалятора: неудаленные ID возвращаются в кучу и сохраняются
+        self._deleter_task.cancel()
+        try:
+            await self._deleter_task
+        except asyncio.CancelledError:
+            pass
+
+        tasks = list(self._ack_tasks.values())
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        # При выгрузке FloodWait не выжидаем: одна попытка на чат
+        for chat_id in list(self._ack_pending):
+            await self._acknowledge(chat_id, retries=1)
+
+        # Задачу сводки не отменяем — посреди отправки это потеряло бы сводку; будим и ждем
+        if self._digest_task:
+            self._digest_closing = True
+            self._digest_now.set()
+            await asyncio.gather(self._digest_task, return_exceptions=True)
+        await self._flush_digest()
+
+    def _reset_stats(self):
+        self._stats = Counter()
+        self._api = Counter()
+        self._prefilter_time = LatencyHistogram()
+        self._ping_time = LatencyHistogram()
+
+    @loader.command(ru_doc="[reset] - Статистика SilentTags")
+    async def silentstatscmd(self, message: Message):
+        """Счетчики и время обработки; reset — сбросить"""
+        if utils.get_args_raw(message).strip() == "reset":
+            self._reset_stats()
+            self._users.hits = self._users.misses = self._chats.hits = self._chats.misses = 0
+            return await utils.answer(message, self.strings("stats_reset"))
+
+        def fmt(seconds: Optional[float]) -> str:
+            if seconds is None:
+                return "—"
+            return f"{seconds * 1e6:.0f} мкс" if seconds < 1e-3 else f"{seconds * 1e3:.1f} мс"
+
+        await utils.answer(message, self.strings("stats").format(
+            seen=self._stats["seen"],
+            rejected=self._stats["rejected"],
+            reply_fetches=self._api["get_reply_message"],
+            pings=self._stats["pings"],
+            replies=self._api["reply"],
+            suppressed=self._stats["suppressed"],
+            prefilter_p50=fmt(self._prefilter_time.percentile(0.5)),
+            prefilter_p99=fmt(self._prefilter_time.percentile(0.99)),
+            ping_p50=fmt(self._ping_time.percentile(0.5)),
+            ping_p99=fmt(self._ping_time.percentile(0.99)),
+            api=", ".join(f"{name} {count}" for name, count in self._api.most_common()) or "—",
+            cache_hits=self._users.hits + self._chats.hits,
+            cache_misses=self._users.misses + self._chats.misses,
+        ))
 
     @loader.command(ru_doc=" - Включить/выключить SilentTags")
     async def silenttagscmd(self, message: Message):
         """Переключает состояние модуля"""
-        state = self._db.get("SilentTags", "state")
-        new_state = not state
+        new_state = not self._enabled
+        self._enabled = new_state
         self._db.set("SilentTags", "state", new_state)
         await utils.answer(message, self.strings("status_on") if new_state else self.strings("status_off"))
 
+    def _schedule_ack(self, message: Message):
+        pending = self._ack_pending.setdefault(message.chat_id, [message.peer_id, message.id])
+        pending[1] = max(pending[1], message.id)
+        if message.chat_id not in self._ack_tasks:
+            self._ack_tasks[message.chat_id] = asyncio.ensure_future(self._ack_later(message.chat_id))
+
+    async def _ack_later(self, chat_id: int):
+        # Пока задача в _ack_tasks, чат занят: новые пинги только поднимают max_id,
+        # в том числе во время FloodWait, и не запускают второй вызов поверх ожидания
+        try:
+            await asyncio.sleep(ACK_DELAY)
+            await self._acknowledge(chat_id)
+        finally:
+            self._ack_tasks.pop(chat_id, None)
+        # Пинги, пришедшие во время последнего вызова, уходят следующим окном
+        if chat_id in self._ack_pending:
+            self._ack_tasks[chat_id] = asyncio.ensure_future(self._ack_later(chat_id))
+
+    async def _acknowledge(self, chat_id: int, retries: int = ACK_RETRIES):
+        """Читает чат до максимального id пинга и снимает все упоминания разом"""
+        for attempt in range(retries):
+            pending = self._ack_pending.get(chat_id)
+            if pending is None:
+                return
+            peer, max_id = pending
+            try:
+                self._api["send_read_acknowledge"] += 1
+                await self._client.send_read_acknowledge(peer, max_id=max_id, clear_mentions=True)
+                if pending[1] == max_id:
+                    del self._ack_pending[chat_id]
+                return
+            except FloodWaitError as e:
+                logger.warning(f"SilentTags FloodWait {e.seconds}s on read acknowledge")
+                if attempt + 1 < retries:
+                    await asyncio.sleep(e.seconds + 1)
+            except Exception as e:
+                logger.error(f"SilentTags fail to clear mention: {e}")
+                break
+        self._ack_pending.pop(chat_id, None)
+
+    async def _call(self, func, *args, **kwargs) -> bool:
+        for attempt in range(DELETE_RETRIES):
+            try:
+                self._api[func.__name__] += 1
+                await func(*args, **kwargs)
+                return True
+            except FloodWaitError as e:
+                logger.warning(f"SilentTags FloodWait {e.seconds}s on {func.__name__}")
+                # После последней попытки ждать незачем, а удалятор один на все чаты
+                if attempt + 1 < DELETE_RETRIES:
+                    await asyncio.sleep(e.seconds + 1)
+            except Exception as e:
+                logger.error(f"SilentTags {func.__name__} failed: {e}")
+                return False
+        return False
+
+    def _schedule_delete(self, chat_id: int, msg_id: int):
+        heapq.heappush(self._deletions, (time.time() + REPLY_TTL, chat_id, msg_id))
+        self._db.set("SilentTags", "deletions", self._deletions)
+        self._deletions_changed.set()
+
+    async def _deleter(self):
+        """Единственный таймер удалений: спит до ближайшего срока и удаляет все истекшее пачками по чатам"""
+        while True:
+            self._deletions_changed.clear()
+            if not self._deletions:
+                await self._deletions_changed.wait()
+                continue
+
+            delay = self._deletions[0][0] - time.time()
+            if delay > 0:
+                # У всех ответов один REPLY_TTL, новые записи не раньше головы кучи — будить сон незачем
+                await asyncio.sleep(delay)
+
+            due = {}
+            horizon = time.time() + DELETE_BATCH_WINDOW
+            while self._deletions and self._deletions[0][0] <= horizon:
+                item = heapq.heappop(self._deletions)
+                due.setdefault(item[1], []).append(item)
+
+            try:
+                for chat_id in list(due):
+                    ids = [item[2] for item in due[chat_id]]
+                    for i in range(0, len(ids), DELETE_CHUNK):
+                        await self._call(self._client.delete_messages, chat_id, ids[i:i + DELETE_CHUNK])
+                    del due[chat_id]
+            finally:
+                # Выгрузка посреди пачки: неудаленное возвращается в кучу и сохраняется
+                for items in due.values():
+                    for item in items:
+                        heapq.heappush(self._deletions, item)
+                self._db.set("SilentTags", "deletions", self._deletions)
+
+    @loader.watcher(only_messages=True, out=True)
+    async def own_watcher(self, message: Message):
+        """Запоминает id своих сообщений для проверки реплаев"""
+        self._own.add(message.chat_id, message.id)
+
+    def _is_ping(self, message: Message) -> Optional[bool]:
+        """Синхронный префильтр: True/False, если решено локально, None — нужен запрос реплая"""
+        self._own.observe(message.chat_id, message.id)
+        if message.sender_id == self._me.id:
+            return False
+        if message.mentioned:
+            return True
+        if not message.is_reply:
+            return False
+        return self._own.is_own(message.chat_id, message.reply_to_msg_id)
+
     @loader.watcher(only_messages=True, out=False)
     async def watcher(self, message: Message):
         """Следит за входящими пингами и чистит их"""
-        if not self._db.get("SilentTags", "state"):
+        if not self._enabled:
             return
 
-        # Проверка на тег или реплай нам
-        is_mention = message.mentioned
-        is_reply_to_me = False
-        
-        if message.is_reply:
-            reply_msg = await message.get_reply_message()
-            if reply_msg and reply_msg.sender_id == self._me.id:
-                is_reply_to_me = True
-
-        if message.sender_id == self._me.id or not (is_mention or is_reply_to_me):
+        # Проверка на тег или реплай нам; до этого места ни одного await
+        started = time.perf_counter()
+        self._stats["seen"] += 1
+        is_ping = self._is_ping(message)
+        if is_ping is False:
+            self._stats["rejected"] += 1
+            self._prefilter_time.add(time.perf_counter() - started)
             return
 
-        # Удаляем уведомление (@)
         try:
-            await self._client.send_read_acknowledge(message.peer_id, message=message, clear_mentions=True)
-        except Exception as e:
-            logger.error(f"SilentTags fail to clear mention: {e}")
+            await self._handle(message, is_ping)
+        finally:
+            self._ping_time.add(time.perf_counter() - started)
+
+    async def _handle(self, message: Message, is_ping: Optional[bool]):
+        if is_ping is None:
+            self._api["get_reply_message"] += 1
+            reply_msg = await message.get_reply_message()
+            is_ping = bool(reply_msg and reply_msg.sender_id == self._me.id)
+            if not is_ping:
+                return
+            self._own.add(message.chat_id, reply_msg.id)
+        self._stats["pings"] += 1
+
+        # Удаляем уведомление (@): одно прочтение на чат за ACK_DELAY
+        self._schedule_ack(message)
 
-        # Отвечаем и запускаем таймер удаления
-        async def send_and_delete():
+        # Отвечаем в пределах лимитов чата и отправителя и ставим ответ в очередь на удаление
+        now = time.monotonic()
+        replied = self._chat_replies.allows(message.chat_id, now) and self._sender_replies.allows(message.sender_id, now)
+        if replied:
+            self._chat_replies.take(message.chat_id, now)
+            self._sender_replies.take(message.sender_id, now)
             try:
+                self._api["reply"] += 1
                 reply = await message.reply(self.strings("troll_text"))
-                await asyncio.sleep(5)
-                await reply.delete()
-            except Exception:
-                pass
-
-        asyncio.create_task(send_and_delete())
+                self._own.add(reply.chat_id, reply.id)
+                self._schedule_delete(reply.chat_id, reply.id)
+            except Exception as e:
+                logger.error(f"SilentTags fail to reply: {e}")
+        else:
+            self._stats["suppressed"] += 1
 
         # Формируем лог в Избранное
-        sender = await message.get_sender()
-        name = utils.escape_html(getattr(sender, 'first_name', 'Неизвестно'))
-        username = f"@{sender.username}" if getattr(sender, 'username', None) else "ID: " + str(sender.id)
-        text = utils.escape_html(message.text or "Медиа/Стикер/ГС")
-        chat = await message.get_chat()
-        chat_title = utils.escape_html(getattr(chat, 'title', 'Личные сообщения'))
+        name, username = await self._sender_display(message)
+        chat_title = await self._chat_display(message)
         
         # Ссылка
         if message.is_private:
-            link = f"tg://user?id={sender.id}"
+            link = f"tg://user?id={message.sender_id}"
         else:
             chat_id = str(message.chat_id).replace("-100", "")
             link = f"https://t.me/c/{chat_id}/{message.id}"
 
+        if self.config["digest"]:
+            text = message.text or "Медиа/Стикер/ГС"
+            if len(text) > DIGEST_TEXT_LIMIT:
+                text = text[:DIGEST_TEXT_LIMIT] + "…"
+            entry = dict(name=name, username=username, text=utils.escape_html(text), link=link, replied=replied)
+            self._add_to_digest(message.chat_id, chat_title, entry)
+            return
+
         log_message = self.strings("log_template").format(
             name=name,
             username=username,
-            text=text,
+            text=utils.escape_html(message.text or "Медиа/Стикер/ГС"),
             chat_title=chat_title,
             link=link
         )
+        if not replied:
+            log_message += self.strings("reply_suppressed")
 
         try:
+            self._api["send_message"] += 1
             await self._client.send_message("me", log_message)
         except Exception:
             pass
+
+    async def _sender_display(self, message: Message) -> tuple:
+        display = self._users.get(message.sender_id)
+        if display is None:
+            sender = message.sender
+            if sender is None:
+                self._api["get_sender"] += 1
+                sender = await message.get_sender()
+            name = utils.escape_html(getattr(sender, 'first_name', None) or 'Неизвестно')
+            username = f"@{sender.username}" if getattr(sender, 'username', None) else "ID: " + str(message.sender_id)
+            display = (name, username)
+            self._users.put(message.sender_id, display)
+        return display
+
+    async def _chat_display(self, message: Message) -> str:
+        title = self._chats.get(message.chat_id)
+        if title is None:
+            chat = message.chat
+            if chat is None:
+                self._api["get_chat"] += 1
+                chat = await message.get_chat()
+            title = utils.escape_html(getattr(chat, 'title', 'Личные сообщения'))
+            self._chats.put(message.chat_id, title)
+        return title
+
+    def _add_to_digest(self, chat_id: int, chat_title: str, entry: dict):
+        self._digest.setdefault(chat_id, [chat_title, []])[1].append(entry)
+        self._digest_count += 1
+        if self._digest_count >= self.config["digest_size"]:
+            self._digest_now.set()
+        if self._digest_task is None:
+            self._digest_task = asyncio.ensure_future(self._flush_digest_later())
+
+    async def _flush_digest_later(self):
+        """Отправляет сводку через digest_interval или сразу по _digest_now, пока есть что отправлять"""
+        try:
+            while self._digest:
+                if not self._digest_closing:
+                    try:
+                        await asyncio.wait_for(self._digest_now.wait(), self.config["digest_interval"])
+                    except asyncio.TimeoutError:
+                        pass
+                    self._digest_now.clear()
+                await self._flush_digest()
+        finally:
+            self._digest_task = None
+
+    async def _flush_digest(self):
+        """Отправляет накопленные пинги одной сводкой, сгруппированной по чатам"""
+        if not self._digest:
+            return
+        digest, count = self._digest, self._digest_count
+        self._digest, self._digest_count = {}, 0
+
+        header = self.strings("digest_header").format(count=count)
+        suppressed = sum(not entry["replied"] for _, entries in digest.values() for entry in entries)
+        if suppressed:
+            header += self.strings("digest_suppressed").format(count=suppressed)
+        lines = [header]
+        for chat_title, entries in digest.values():
+            lines.append(self.strings("digest_chat").format(chat_title=chat_title, count=len(entries)))
+            lines.extend(
+                self.strings("digest_entry" if entry["replied"] else "digest_entry_suppressed").format(**entry)
+                for entry in entries
+            )
+
+        # Длинная сводка делится на сообщения по строкам
+        chunks = [""]
+        for line in lines:
+            if chunks[-1] and len(chunks[-1]) + len(line) + 1 > DIGEST_MESSAGE_LIMIT:
+                chunks.append("")
+            chunks[-1] += ("\n" if chunks[-1] else "") + line
+
+        for chunk in chunks:
+            try:
+                self._api["send_message"] += 1
+                await self._client.send_message("me", chunk, link_preview=False)
+            except Exception as e:
+                logger.error(f"SilentTags fail to send digest: {e}")
@@ -14,7 +14,8 @@ import logging
 import asyncio
 from herokutl.tl.functions.channels import CreateChannelRequest, UpdateUsernameRequest
 from herokutl.tl.functions.contacts import ResolveUsernameRequest
-from herokutl.errors import UsernameNotOccupiedError, FloodWaitError
+from herokutl.errors import ChannelInvalidError, ChannelPrivateError, UsernameNotOccupiedError, FloodWaitError
+from herokutl.tl.types import InputChannel
 from .. import loader, utils
 
 logger = logging.getLogger(__name__)
@@ -38,9 +39,30 @@ class UserGrabberMod(loader.Module):
     async def client_ready(self, client, db):
         self._client = client
         self._db = db
-        # Инициализируем переменные при запуске
-        self._target = None
+        # Цель и канал-заготовка хранятся в БД: после перезапуска мониторинг продолжается сам
+        self._target = self._db.get("UserGrabber", "target")
+        self._channel = self._db.get("UserGrabber", "channel")
         self._task = None
+        if self._target:
+            logger.info(f"Resuming grabber loop for @{self._target}")
+            self._task = asyncio.create_task(self._grabber_loop())
+
+    async def on_unload(self):
+        await self._stop_task()
+
+    async def _stop_task(self):
+        """Отменяет цикл и дожидается его завершения"""
+        task, self._task = self._task, None
+        if task and not task.done():
+            task.cancel()
+            try:
+                await task
+            except asyncio.CancelledError:
+                pass
+
+    def _save_state(self):
+        self._db.set("UserGrabber", "target", self._target)
+        self._db.set("UserGrabber", "channel", self._channel)
 
     @loader.command(
         ru_doc="<username> - Начать слежку за юзернеймом (без @)",
@@ -66,6 +88,8 @@ class UserGrabberMod(loader.Module):
             return
 
         self._target = target
+        self._channel = None
+        self._save_state()
         self._task = asyncio.create_task(self._grabber_loop())
         
         await utils.answer(message, self.strings("started").format(target))
@@ -75,9 +99,10 @@ class UserGrabberMod(loader.Module):
         """Остановить перехватчик"""
         task = getattr(self, '_task', None)
         if task and not task.done():
-            task.cancel()
-            self._task = None
+            await self._stop_task()
             self._target = None
+            self._channel = None
+            self._save_state()
             await utils.answer(message, self.strings("stopped"))
         else:
             await utils.answer(message, "<b>❌ Мониторинг не запущен.</b>")
@@ -100,6 +125,8 @@ class UserGrabberMod(loader.Module):
                 if success:
                     await self._client.send_message("me", self.strings("success").format(self._target))
                     self._target = None
+                    self._channel = None
+                    self._save_state()
                     self._task = None
                     break
                     
@@ -107,7 +134,7 @@ class UserGrabberMod(loader.Module):
                 logger.warning(f"FloodWait for {e.seconds} seconds")
                 await asyncio.sleep(e.seconds)
             except asyncio.CancelledError:
-                break
+                raise
             except Exception as e:
                 logger.error(f"Grabber loop error: {e}")
 
@@ -117,16 +144,21 @@ class UserGrabberMod(loader.Module):
     async def _snatch_username(self):
         """Создание канала и установка юзернейма"""
         try:
-            # 1. Создаем канал
-            created_chat = await self._client(CreateChannelRequest(
-                title=f"Reserved @{self._target}",
-                about="This username has been snatched by UserGrabber.",
-                megagroup=False
-            ))
-            
-            # В Telethon результат CreateChannelRequest возвращает объект Updates
-            # Находим там ID созданного канала
-            channel = created_chat.chats[0]
+            # 1. Создаем канал, если его не осталось от прошлой неудачной попытки
+            if self._channel:
+                channel = InputChannel(*self._channel)
+            else:
+                created_chat = await self._client(CreateChannelRequest(
+                    title=f"Reserved @{self._target}",
+                    about="This username has been snatched by UserGrabber.",
+                    megagroup=False
+                ))
+                
+                # В Telethon результат CreateChannelRequest возвращает объект Updates
+                # Находим там ID созданного канала
+                channel = created_chat.chats[0]
+                self._channel = [channel.id, channel.access_hash]
+                self._save_state()
             
             # 2. Пытаемся поставить юзернейм
             await self._client(UpdateUsernameRequest(
@@ -135,6 +167,12 @@ class UserGrabberMod(loader.Module):
             ))
             return True
             
+        except (ChannelInvalidError, ChannelPrivateError) as e:
+            # Сохраненный канал удален или недоступен — в следующий раз создадим новый
+            logger.error(f"Snatch failed, reserved channel is gone: {e}")
+            self._channel = None
+            self._save_state()
+            return False
         except Exception as e:
             logger.error(f"Snatch failed: {e}")
             return False
\ No newline at end of file
@@ -5,7 +5,7 @@
     эвристического анализа кода и безопасного просмотра .py файлов.
 """
 
-__version__ = (5, 1, 1)
+__version__ = (5, 7, 0)
 
 # meta developer: @sxozuo @HarutyaModules
 # meta pic: https://img.icons8.com/fluency/160/security-checked.png
@@ -13,12 +13,20 @@ __version__ = (5, 1, 1)
 # requires: aiohttp
 
 import asyncio
+import hashlib
+import json
 import logging
 import os
+import random
 import re
+import sqlite3
+import tarfile
 import tempfile
 import time
-from datetime import datetime
+import zipfile
+from array import array
+from collections import OrderedDict
+from datetime import datetime, timedelta, timezone
 from pathlib import Path
 from typing import Dict, List, Optional
 import aiohttp
@@ -28,8 +36,8 @@ from .. import loader, utils
 logger = logging.getLogger(__name__)
 
 DANGEROUS_PATTERNS = [
-    (r"os\.(system|popen|spawn|exec)", "OS Command Execution"),
-    (r"subprocess\.(run|call|Popen)", "Subprocess Execution"),
+    (r"os\.(?:system|popen|spawn|exec)", "OS Command Execution"),
+    (r"subprocess\.(?:run|call|Popen)", "Subprocess Execution"),
     (r"eval\(", "Code Evaluation (eval)"),
     (r"exec\(", "Code Execution (exec)"),
     (r"__import__\(", "Dynamic Import"),
@@ -40,6 +48,301 @@ DANGEROUS_PATTERNS = [
     (r"aiohttp\.", "Network Activity (aiohttp)"),
 ]
 
+# Лимиты эвристики для архивов: члены читаются в память по одному, без распаковки на диск
+ARCHIVE_MEMBER_LIMIT = 2 * 1024 * 1024
+ARCHIVE_MAX_MEMBERS = 1000
+ARCHIVE_SUFFIXES = (".zip", ".tar", ".tar.gz", ".tgz", ".tar.bz2", ".tar.xz")
+MAX_FINDINGS = 30
+
+# Просмотр кода: размер страницы в байтах и границы хранилища сессий
+CODE_PAGE_SIZE = 2000
+MAX_CODE_SESSIONS = 32
+CODE_SESSION_TTL = 3600
+
+VT_API_URL = "https://www.virustotal.com/api/v3"
+VT_GUI_URL = "https://www.virustotal.com/gui"
+
+CACHE_PATH = Path.home() / ".viruscheck" / "reports.sqlite3"
+
+# Прямой POST /files принимает до 32 МБ, крупнее — через /files/upload_url
+VT_DIRECT_UPLOAD_LIMIT = 32 * 1024 * 1024
+CHUNK_SIZE = 512 * 1024
+PIPE_CHUNKS = 8
+
+# Опрос анализов: экспоненциальная задержка с джиттером
+POLL_BASE_DELAY = 10
+POLL_MAX_DELAY = 300
+POLL_GIVE_UP = 24 * 3600
+
+# 429 от VT: GET повторяется после сброса лимитера, скан с 429 возвращается в очередь
+VT_429_RETRIES = 5
+SCAN_REQUEUE_LIMIT = 3
+
+
+class HeuristicScanner:
+    """Все DANGEROUS_PATTERNS одной альтернацией: один проход по коду вместо прохода на паттерн"""
+
+    def __init__(self, patterns: list):
+        self._descs = [desc for _, desc in patterns]
+        self._regex = re.compile("|".join(f"(?P<h{i}>{pattern})" for i, (pattern, _) in enumerate(patterns)))
+
+    def scan(self, code: str) -> Dict[str, List[int]]:
+        """Возвращает {описание: [номера строк]} в порядке первого появления"""
+        found = {}
+        line, pos = 1, 0
+        for match in self._regex.finditer(code):
+            line += code.count("\n", pos, match.start())
+            pos = match.start()
+            found.setdefault(self._descs[int(match.lastgroup[1:])], []).append(line)
+        return found
+
+    def scan_archive(self, path: str):
+        """Сканирует .py-файлы внутри zip/tar потоком. Возвращает пары (имя, находки)"""
+        if zipfile.is_zipfile(path):
+            with zipfile.ZipFile(path) as archive:
+                for info in archive.infolist()[:ARCHIVE_MAX_MEMBERS]:
+                    if info.is_dir() or not info.filename.endswith(".py") or info.file_size > ARCHIVE_MEMBER_LIMIT:
+                        continue
+                    with archive.open(info) as member:
+                        code = member.read(ARCHIVE_MEMBER_LIMIT).decode("utf-8", errors="ignore")
+                    yield info.filename, self.scan(code)
+            return
+
+        # "r|*" — потоковый режим: члены читаются последовательно, без seek и без распаковки
+        with tarfile.open(path, "r|*") as archive:
+            for index, info in enumerate(archive):
+                if index >= ARCHIVE_MAX_MEMBERS:
+                    break
+                if not info.isfile() or not info.name.endswith(".py") or info.size > ARCHIVE_MEMBER_LIMIT:
+                    continue
+                code = archive.extractfile(info).read().decode("utf-8", errors="ignore")
+                yield info.name, self.scan(code)
+
+
+HEURISTICS = HeuristicScanner(DANGEROUS_PATTERNS)
+
+
+class ReportCache:
+    """Локальный SQLite-кэш отчетов VirusTotal по SHA-256 файла"""
+
+    def __init__(self, path: Path, ttl: int):
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        path.parent.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(str(path))
+        self._conn.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS reports (
+                sha256 TEXT PRIMARY KEY,
+                stats TEXT NOT NULL,
+                link TEXT NOT NULL,
+                scan_date REAL NOT NULL,
+                heuristics TEXT
+            );
+            CREATE TABLE IF NOT EXISTS documents (
+                doc_id INTEGER PRIMARY KEY,
+                sha256 TEXT NOT NULL
+            );
+            """
+        )
+
+    def _load(self, sha256: str) -> Optional[dict]:
+        row = self._conn.execute(
+            "SELECT stats, link, scan_date, heuristics FROM reports WHERE sha256 = ?",
+            (sha256,),
+        ).fetchone()
+        if not row:
+            return None
+        if self.ttl and time.time() - row[2] > self.ttl:
+            self._conn.execute("DELETE FROM reports WHERE sha256 = ?", (sha256,))
+            self._conn.commit()
+            return None
+        return {
+            "sha256": sha256,
+            "stats": json.loads(row[0]),
+            "link": row[1],
+            "scan_date": row[2],
+            "heuristics": json.loads(row[3]) if row[3] else None,
+        }
+
+    def get(self, sha256: str) -> Optional[dict]:
+        entry = self._load(sha256)
+        if entry:
+            self.hits += 1
+        else:
+            self.misses += 1
+        return entry
+
+    def get_document(self, doc_id: int) -> Optional[dict]:
+        """Поиск по ID документа Telegram — пересланные копии не нужно даже скачивать"""
+        row = self._conn.execute(
+            "SELECT sha256 FROM documents WHERE doc_id = ?", (doc_id,)
+        ).fetchone()
+        entry = self._load(row[0]) if row else None
+        if entry:
+            self.hits += 1
+        return entry
+
+    def put(
+        self,
+        sha256: str,
+        stats: dict,
+        link: str,
+        scan_date: float,
+        heuristics: Optional[List[str]],
+        doc_id: Optional[int] = None,
+    ):
+        self._conn.execute(
+            "INSERT OR REPLACE INTO reports VALUES (?, ?, ?, ?, ?)",
+            (sha256, json.dumps(stats), link, scan_date, json.dumps(heuristics) if heuristics is not None else None),
+        )
+        if doc_id is not None:
+            self.link_document(doc_id, sha256)
+        self._conn.commit()
+
+    def link_document(self, doc_id: int, sha256: str):
+        self._conn.execute("INSERT OR REPLACE INTO documents VALUES (?, ?)", (doc_id, sha256))
+        self._conn.commit()
+
+    def purge(self) -> int:
+        if not self.ttl:
+            return 0
+        cur = self._conn.execute("DELETE FROM reports WHERE scan_date < ?", (time.time() - self.ttl,))
+        self._conn.execute("DELETE FROM documents WHERE sha256 NOT IN (SELECT sha256 FROM reports)")
+        self._conn.commit()
+        return cur.rowcount
+
+    def clear(self):
+        self._conn.execute("DELETE FROM reports")
+        self._conn.execute("DELETE FROM documents")
+        self._conn.commit()
+        self.hits = self.misses = 0
+
+    def __len__(self) -> int:
+        return self._conn.execute("SELECT COUNT(*) FROM reports").fetchone()[0]
+
+    def close(self):
+        self._conn.close()
+
+
+class CodeSession:
+    """Одна копия байтов файла и индекс начала страниц, выровненный по границам строк"""
+
+    __slots__ = ("name", "data", "offsets", "expires")
+
+    def __init__(self, name: str, data: bytes, page_size: int = CODE_PAGE_SIZE):
+        self.name = name
+        self.data = data
+        self.offsets = self._paginate(data, page_size)
+        self.expires = 0.0
+
+    @staticmethod
+    def _paginate(data: bytes, page_size: int) -> array:
+        offsets = array("I", [0])
+        start = 0
+        while len(data) - start > page_size:
+            limit = start + page_size
+            cut = data.rfind(b"\n", start, limit) + 1
+            if cut <= start:
+                # Строка длиннее страницы — режем, не разрывая UTF-8 символ
+                cut = limit
+                while cut > start and (data[cut] & 0xC0) == 0x80:
+                    cut -= 1
+                if cut == start:
+                    cut = limit
+            offsets.append(cut)
+            start = cut
+        return offsets
+
+    def __len__(self) -> int:
+        return len(self.offsets)
+
+    def page(self, index: int) -> str:
+        end = self.offsets[index + 1] if index + 1 < len(self.offsets) else len(self.data)
+        return self.data[self.offsets[index]:end].decode("utf-8", errors="replace")
+
+
+class SessionStore:
+    """LRU-хранилище сессий просмотра кода со скользящим TTL"""
+
+    def __init__(self, max_sessions: int, ttl: int):
+        self.max_sessions = max_sessions
+        self.ttl = ttl
+        self._items: "OrderedDict[str, CodeSession]" = OrderedDict()
+
+    def put(self, key: str, session: CodeSession):
+        session.expires = time.monotonic() + self.ttl
+        self._items[key] = session
+        self._items.move_to_end(key)
+        while len(self._items) > self.max_sessions:
+            self._items.popitem(last=False)
+
+    def get(self, key: str) -> Optional[CodeSession]:
+        session = self._items.get(key)
+        if not session:
+            return None
+        if session.expires < time.monotonic():
+            del self._items[key]
+            return None
+        session.expires = time.monotonic() + self.ttl
+        self._items.move_to_end(key)
+        return session
+
+
+class TokenBucket:
+    """Лимитер запросов к VT: токены в минуту плюс суточная квота (сброс в 00:00 UTC)"""
+
+    def __init__(self, per_minute: int, per_day: int, state: Optional[dict] = None):
+        self.configure(per_minute, per_day)
+        self.tokens = float(per_minute)
+        self.day = (state or {}).get("day", self._today())
+        self.used_today = (state or {}).get("used", 0)
+        self._updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    @staticmethod
+    def _today() -> str:
+        return datetime.now(timezone.utc).date().isoformat()
+
+    def configure(self, per_minute: int, per_day: int):
+        self.capacity = per_minute
+        self.rate = per_minute / 60
+        self.per_day = per_day
+
+    def state(self) -> dict:
+        return {"day": self.day, "used": self.used_today}
+
+    def drain(self):
+        """VT ответил 429 — ждем полного окна, прежде чем тратить следующий токен"""
+        self.tokens = 1.0 - self.capacity
+        self._updated = time.monotonic()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    async def acquire(self):
+        # asyncio.Lock отдает управление ожидающим по очереди, так что порядок FIFO
+        async with self._lock:
+            while True:
+                if self.day != self._today():
+                    self.day, self.used_today = self._today(), 0
+
+                if self.per_day and self.used_today >= self.per_day:
+                    tomorrow = datetime.now(timezone.utc).replace(hour=0, minute=0, second=0, microsecond=0) + timedelta(days=1)
+                    await asyncio.sleep((tomorrow - datetime.now(timezone.utc)).total_seconds() + 1)
+                    continue
+
+                self._refill()
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    self.used_today += 1
+                    return
+                await asyncio.sleep((1 - self.tokens) / self.rate)
+
+
 @loader.tds
 class VirusCheckMod(loader.Module):
     """VirusTotal scans and safe .py code viewer"""
@@ -57,8 +360,11 @@ class VirusCheckMod(loader.Module):
         # VirusTotal
         "no_key": "❌ <b>API ключ VirusTotal не установлен!</b> Используйте <code>.vtkey <key></code>",
         "key_saved": "✅ <b>API ключ сохранен!</b>",
-        "scan_start": "🚀 <b>Запуск анализа...</b>",
+        "scan_start": "🚀 <b>Запуск анализа...</b>\n<i>Результат появится в этом сообщении.</i>",
+        "scan_timeout": "⚠️ <b>Анализ длится слишком долго.</b> Проверьте позже: <a href='{link}'>отчет на VT</a>",
         "uploading": "📤 <b>Загрузка на VirusTotal...</b>",
+        "queued": "🕓 <b>Файл в очереди на сканирование.</b> Позиция: <code>{}</code>",
+        "quota_exceeded": "❌ <b>Квота VirusTotal исчерпана.</b> Попробуйте позже.",
         "vt_report": (
             "🔬 <b>Отчет VirusTotal</b>\n\n"
             "🔗 <a href='{link}'>Открыть отчет</a>\n"
@@ -67,42 +373,263 @@ class VirusCheckMod(loader.Module):
         ),
         "clean": "Чисто ✅",
         "danger": "Опасно 🚨",
+        "cached": "\n💾 <i>Ответ из локального кэша</i>",
+
+        # Cache
+        "cache_stats": (
+            "💾 <b>Кэш отчетов</b>\n\n"
+            "📦 <b>Записей:</b> <code>{entries}</code>\n"
+            "✅ <b>Попаданий:</b> <code>{hits}</code>\n"
+            "❌ <b>Промахов:</b> <code>{misses}</code>\n"
+            "⏱ <b>TTL:</b> <code>{ttl} ч.</code>\n\n"
+            "📊 <b>Квота VT сегодня:</b> <code>{used}/{quota}</code>\n"
+            "🕓 <b>В очереди:</b> <code>{queued}</code>"
+        ),
+        "cache_cleared": "🧹 <b>Кэш очищен!</b>",
         
         # Heuristics
         "h_title": "🛡️ <b>Эвристический анализ:</b>",
         "h_clean": "✅ Подозрительных паттернов не обнаружено.",
         "h_warning": "⚠️ <b>Найдены подозрительные элементы:</b>",
+        "h_lines": "стр.",
+        "h_more": "… и еще <code>{}</code>",
+        "h_archive_error": "⚠️ Не удалось прочитать архив.",
         
         # Config
         "cfg_key": "API ключ VirusTotal",
         "cfg_max_kb": "Макс. размер файла (KB)",
-        "cfg_cooldown": "Задержка (сек)",
+        "cfg_rate_limit": "Лимит запросов к VT в минуту (публичный ключ — 4)",
+        "cfg_daily_quota": "Суточная квота запросов к VT (публичный ключ — 500, 0 — без ограничения)",
+        "cfg_cache_ttl": "Время жизни отчета в локальном кэше (часы, 0 — без ограничения)",
     }
 
     def __init__(self):
         self.config = loader.ModuleConfig(
             loader.ConfigValue("vt_api_key", "", lambda: self.strings("cfg_key"), validator=loader.validators.Hidden()),
             loader.ConfigValue("max_code_kb", 512, lambda: self.strings("cfg_max_kb"), validator=loader.validators.Integer(minimum=10)),
-            loader.ConfigValue("cooldown", 5, lambda: self.strings("cfg_cooldown"), validator=loader.validators.Integer(minimum=0)),
+            loader.ConfigValue("vt_rate_limit", 4, lambda: self.strings("cfg_rate_limit"), validator=loader.validators.Integer(minimum=1)),
+            loader.ConfigValue("vt_daily_quota", 500, lambda: self.strings("cfg_daily_quota"), validator=loader.validators.Integer(minimum=0)),
+            loader.ConfigValue("cache_ttl", 24, lambda: self.strings("cfg_cache_ttl"), validator=loader.validators.Integer(minimum=0)),
         )
-        self._sessions = {}
-        self._last_scan = 0
+        self._sessions = SessionStore(MAX_CODE_SESSIONS, CODE_SESSION_TTL)
 
     async def client_ready(self, client, db):
         self._client = client
         self._http = aiohttp.ClientSession(
             headers={"x-apikey": self.config["vt_api_key"]} if self.config["vt_api_key"] else {}
         )
+        self._cache = ReportCache(CACHE_PATH, self.config["cache_ttl"] * 3600)
+        self._cache.purge()
+
+        # Незавершенные анализы переживают перезагрузку модуля
+        self._db = db
+        self._pending = dict(self._db.get("VirusCheck", "pending", {}))
+        self._poll_wake = asyncio.Event()
+        self._poller_task = asyncio.create_task(self._poller())
+
+        self._limiter = TokenBucket(
+            self.config["vt_rate_limit"],
+            self.config["vt_daily_quota"],
+            self._db.get("VirusCheck", "quota"),
+        )
+        self._queue = asyncio.Queue()
+        self._scan_busy = False
+        self._worker_task = asyncio.create_task(self._scan_worker())
 
     async def on_unload(self):
+        for task in (self._worker_task, self._poller_task):
+            task.cancel()
+            try:
+                await task
+            except asyncio.CancelledError:
+                pass
+        self._save_pending()
         await self._http.close()
+        self._cache.close()
+
+    def _save_pending(self):
+        self._db.set("VirusCheck", "pending", self._pending)
+
+    async def _vt_request(self, method: str, url: str, **kwargs) -> tuple:
+        """Запрос к VT через общий лимитер. Возвращает (status, json)"""
+        for attempt in range(VT_429_RETRIES):
+            self._limiter.configure(self.config["vt_rate_limit"], self.config["vt_daily_quota"])
+            await self._limiter.acquire()
+            self._db.set("VirusCheck", "quota", self._limiter.state())
+
+            async with self._http.request(method, url, **kwargs) as resp:
+                data = await resp.json(content_type=None)
+                # Тело POST уже отправлено, повторяем только GET
+                if resp.status == 429 and method == "GET" and attempt < VT_429_RETRIES - 1:
+                    self._limiter.drain()
+                    continue
+                return resp.status, data
+
+    def _make_entry(self, sha256: str, stats: dict, scan_date: Optional[float], found: Optional[List[str]]) -> dict:
+        return {
+            "sha256": sha256,
+            "stats": stats,
+            "link": f"{VT_GUI_URL}/file/{sha256}",
+            "scan_date": scan_date or time.time(),
+            "heuristics": found,
+        }
+
+    def _track(self, analysis_id: str, msg, doc_id: Optional[int], found: Optional[List[str]]):
+        now = time.time()
+        self._pending[analysis_id] = {
+            "chat_id": msg.chat_id,
+            "msg_id": msg.id,
+            "doc_id": doc_id,
+            "found": found,
+            "attempt": 0,
+            "started": now,
+            "next_poll": now + POLL_BASE_DELAY,
+        }
+        self._save_pending()
+        self._poll_wake.set()
+
+    async def _poller(self):
+        """Один опросчик на все анализы в процессе"""
+        while True:
+            try:
+                self._poll_wake.clear()
+                if not self._pending:
+                    await self._poll_wake.wait()
+                    continue
+
+                delay = min(info["next_poll"] for info in self._pending.values()) - time.time()
+                if delay > 0:
+                    try:
+                        await asyncio.wait_for(self._poll_wake.wait(), delay)
+                    except asyncio.TimeoutError:
+                        pass
+                    continue
+
+                for analysis_id, info in list(self._pending.items()):
+                    if info["next_poll"] <= time.time():
+                        await self._poll_analysis(analysis_id, info)
+                self._save_pending()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.exception(e)
+                await asyncio.sleep(POLL_BASE_DELAY)
+
+    async def _poll_analysis(self, analysis_id: str, info: dict):
+        entry = None
+        # Любой сбой (сеть, не-JSON, неожиданная схема ответа) — обычная неудачная попытка:
+        # иначе ее поймал бы _poller и опрашивал анализ каждые POLL_BASE_DELAY без отказа
+        try:
+            status, res = await self._vt_request("GET", f"{VT_API_URL}/analyses/{analysis_id}")
+            if status == 200 and res["data"]["attributes"]["status"] == "completed":
+                entry = self._make_entry(
+                    res["meta"]["file_info"]["sha256"],
+                    res["data"]["attributes"]["stats"],
+                    res["data"]["attributes"].get("date"),
+                    info["found"],
+                )
+        except Exception as e:
+            logger.warning(f"VT poll failed for {analysis_id}: {e!r}")
+
+        if entry:
+            del self._pending[analysis_id]
+            self._cache.put(doc_id=info["doc_id"], **entry)
+            await self._edit_status(info, self._format_report(entry))
+            return
+
+        if time.time() - info["started"] > POLL_GIVE_UP:
+            del self._pending[analysis_id]
+            await self._edit_status(info, self.strings("scan_timeout").format(
+                link=f"{VT_GUI_URL}/file-analysis/{analysis_id}"
+            ))
+            return
+
+        info["attempt"] += 1
+        delay = min(POLL_MAX_DELAY, POLL_BASE_DELAY * 2 ** info["attempt"])
+        info["next_poll"] = time.time() + random.uniform(delay / 2, delay)
+
+    async def _edit_status(self, info: dict, text: str):
+        try:
+            await self._client.edit_message(info["chat_id"], info["msg_id"], text, parse_mode="html")
+        except Exception as e:
+            logger.warning(f"Failed to edit VirusCheck status message: {e}")
+
+    async def _download(self, reply, path: str, pipe: Optional[asyncio.Queue] = None) -> str:
+        """Скачивает файл по частям на диск, считая SHA-256 на лету.
+
+        Если передан pipe, каждая часть также уходит в него для параллельной загрузки на VT
+        (None в конце — признак окончания файла, исключение — ошибка скачивания).
+        """
+        digest = hashlib.sha256()
+        try:
+            with open(path, "wb") as f:
+                async for chunk in self._client.iter_download(reply.media, chunk_size=CHUNK_SIZE):
+                    digest.update(chunk)
+                    f.write(chunk)
+                    if pipe is not None:
+                        await pipe.put(chunk)
+        except Exception as e:
+            # Передаем ошибку загрузчику, иначе он отправит на VT обрезанный файл
+            if pipe is not None:
+                await pipe.put(e)
+            raise
+
+        if pipe is not None:
+            await pipe.put(None)
+        return digest.hexdigest()
+
+    @staticmethod
+    async def _file_chunks(path: str):
+        loop = asyncio.get_running_loop()
+        with open(path, "rb") as f:
+            while chunk := await loop.run_in_executor(None, f.read, CHUNK_SIZE):
+                yield chunk
+
+    @staticmethod
+    async def _pipe_chunks(pipe: asyncio.Queue):
+        while (chunk := await pipe.get()) is not None:
+            if isinstance(chunk, Exception):
+                raise chunk
+            yield chunk
+
+    @staticmethod
+    def _multipart(chunks, filename: str) -> aiohttp.MultipartWriter:
+        writer = aiohttp.MultipartWriter("form-data")
+        part = writer.append_payload(aiohttp.AsyncIterablePayload(chunks))
+        part.set_content_disposition("form-data", name="file", filename=filename)
+        return writer
+
+    async def _upload(self, url: str, chunks, filename: str) -> tuple:
+        try:
+            return await self._vt_request("POST", url, data=self._multipart(chunks, filename))
+        finally:
+            # Закрываем генератор явно, чтобы файл не ждал сборщика мусора
+            await chunks.aclose()
+
+    def _format_heuristics(self, found: Optional[List[str]]) -> str:
+        if found is None:
+            return ""
+        return f"\n\n{self.strings('h_title')}\n" + ("\n".join(found) if found else self.strings("h_clean"))
+
+    def _format_report(self, entry: dict) -> str:
+        stats = entry["stats"]
+        malicious = stats["malicious"] + stats["suspicious"]
+        return self.strings("vt_report").format(
+            link=entry["link"], malicious=malicious, total=sum(stats.values()),
+            status=self.strings("danger") if malicious > 0 else self.strings("clean"),
+            date=datetime.fromtimestamp(entry["scan_date"]).strftime("%d.%m.%Y %H:%M")
+        ) + self._format_heuristics(entry["heuristics"])
+
+    def _format_findings(self, findings: Dict[str, List[int]], member: Optional[str] = None) -> List[str]:
+        prefix = f"<code>{utils.escape_html(member)}</code>: " if member else ""
+        lines = []
+        for desc, line_numbers in findings.items():
+            numbers = ", ".join(map(str, line_numbers[:5])) + ("…" if len(line_numbers) > 5 else "")
+            lines.append(f"• {prefix}<code>{desc}</code> ({self.strings('h_lines')} {numbers})")
+        return lines
 
     def _get_heuristics(self, code: str) -> List[str]:
-        found = []
-        for pattern, desc in DANGEROUS_PATTERNS:
-            if re.search(pattern, code):
-                found.append(f"• <code>{desc}</code>")
-        return found
+        return self._format_findings(HEURISTICS.scan(code))
 
     @loader.command(ru_doc="<ключ> - Установить API ключ VirusTotal")
     async def vtkeycmd(self, message: Message):
@@ -114,6 +641,20 @@ class VirusCheckMod(loader.Module):
         self._http._default_headers.update({"x-apikey": args})
         await utils.answer(message, self.strings("key_saved"))
 
+    @loader.command(ru_doc="[clear] - Статистика локального кэша отчетов (clear — очистить)")
+    async def vtcachecmd(self, message: Message):
+        if utils.get_args_raw(message).strip().lower() == "clear":
+            self._cache.clear()
+            await utils.answer(message, self.strings("cache_cleared"))
+            return
+
+        await utils.answer(message, self.strings("cache_stats").format(
+            entries=len(self._cache), hits=self._cache.hits,
+            misses=self._cache.misses, ttl=self.config["cache_ttl"],
+            used=self._limiter.used_today, quota=self.config["vt_daily_quota"] or "∞",
+            queued=self._queue.qsize() + self._scan_busy,
+        ))
+
     @loader.command(ru_doc="Проверить файл в ответе через VirusTotal")
     async def scanfilecmd(self, message: Message):
         reply = await message.get_reply_message()
@@ -121,64 +662,141 @@ class VirusCheckMod(loader.Module):
             await utils.answer(message, self.strings("no_file"))
             return
 
+        self._cache.ttl = self.config["cache_ttl"] * 3600
+        doc_id = reply.document.id if reply.document else None
+        if doc_id is not None:
+            entry = self._cache.get_document(doc_id)
+            if entry:
+                await utils.answer(message, self._format_report(entry) + self.strings("cached"))
+                return
+
         if not self.config["vt_api_key"]:
             await utils.answer(message, self.strings("no_key"))
             return
 
-        if time.time() - self._last_scan < self.config["cooldown"]:
-            await utils.answer(message, f"⏳ Подождите {self.config['cooldown']} сек.")
+        msg = await utils.answer(message, self.strings("queued").format(self._queue.qsize() + self._scan_busy + 1))
+        self._queue.put_nowait((msg, reply, doc_id, 0))
+
+    async def _requeue(self, msg, reply, doc_id: Optional[int], attempt: int):
+        """429 от VT: лимитер сброшен, скан ждет квоту в конце очереди вместо отказа"""
+        self._limiter.drain()
+        if attempt >= SCAN_REQUEUE_LIMIT:
+            await utils.answer(msg, self.strings("quota_exceeded"))
             return
+        msg = await utils.answer(msg, self.strings("queued").format(self._queue.qsize() + 1))
+        self._queue.put_nowait((msg, reply, doc_id, attempt + 1))
+
+    async def _scan_worker(self):
+        """Обрабатывает очередь сканирований по мере доступной квоты"""
+        while True:
+            msg, reply, doc_id, attempt = await self._queue.get()
+            self._scan_busy = True
+            try:
+                await self._process_scan(msg, reply, doc_id, attempt)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.exception(e)
+            finally:
+                self._scan_busy = False
+                self._queue.task_done()
+
+    async def _process_scan(self, msg, reply, doc_id: Optional[int], attempt: int = 0):
+        msg = await utils.answer(msg, self.strings("uploading"))
+        path = None
 
-        msg = await utils.answer(message, self.strings("uploading"))
-        
         try:
             with tempfile.NamedTemporaryFile(suffix=".bin", delete=False) as tmp:
                 path = tmp.name
-                await self._client.download_media(reply, path)
-            
-            heuristics = ""
-            if reply.file and reply.file.name and reply.file.name.endswith(".py"):
-                with open(path, "r", encoding="utf-8", errors="ignore") as f:
-                    found = self._get_heuristics(f.read())
-                    heuristics = f"\n\n{self.strings('h_title')}\n" + ("\n".join(found) if found else self.strings("h_clean"))
-
-            form = aiohttp.FormData()
-            form.add_field("file", open(path, "rb"), filename=reply.file.name or "file.bin")
-            
-            async with self._http.post("https://www.virustotal.com/api/v3/files", data=form) as resp:
-                if resp.status != 200:
-                    err = await resp.json()
-                    await utils.answer(msg, f"❌ VT Error: {err.get('error', {}).get('message')}")
+
+            name = reply.file.name if reply.file and reply.file.name else "file.bin"
+            if reply.file and reply.file.size and reply.file.size > VT_DIRECT_UPLOAD_LIMIT:
+                status, data, found = await self._upload_large(reply, path, name)
+            else:
+                sha256 = await self._download(reply, path)
+                entry = self._cache.get(sha256)
+                if entry:
+                    if doc_id is not None:
+                        self._cache.link_document(doc_id, sha256)
+                    await utils.answer(msg, self._format_report(entry) + self.strings("cached"))
+                    return
+
+                found = await self._heuristics(path, name)
+
+                # Уже известный VT файл стоит одного запроса вместо загрузки и опросов
+                status, data = await self._vt_request("GET", f"{VT_API_URL}/files/{sha256}")
+                if status == 429:
+                    await self._requeue(msg, reply, doc_id, attempt)
+                    return
+                if status == 200 and data["data"]["attributes"].get("last_analysis_date"):
+                    attrs = data["data"]["attributes"]
+                    entry = self._make_entry(sha256, attrs["last_analysis_stats"], attrs["last_analysis_date"], found)
+                    self._cache.put(doc_id=doc_id, **entry)
+                    await utils.answer(msg, self._format_report(entry))
                     return
-                data = await resp.json()
-            
-            analysis_id = data["data"]["id"]
-            await utils.answer(msg, self.strings("scan_start") + heuristics)
-            
-            for _ in range(12):
-                await asyncio.sleep(10)
-                async with self._http.get(f"https://www.virustotal.com/api/v3/analyses/{analysis_id}") as resp:
-                    res = await resp.json()
-                    if res["data"]["attributes"]["status"] == "completed":
-                        stats = res["data"]["attributes"]["stats"]
-                        malicious = stats["malicious"] + stats["suspicious"]
-                        total = sum(stats.values())
-                        report_link = f"https://www.virustotal.com/gui/file/{res['meta']['file_info']['sha256']}"
-                        
-                        await utils.answer(msg, self.strings("vt_report").format(
-                            link=report_link, malicious=malicious, total=total,
-                            status=self.strings("danger") if malicious > 0 else self.strings("clean"),
-                            date=datetime.now().strftime("%d.%m.%Y %H:%M")
-                        ) + heuristics)
-                        self._last_scan = time.time()
-                        return
-            
-            await utils.answer(msg, "⚠️ Анализ длится долго. Проверьте позже по ссылке на VT.")
+
+                status, data = await self._upload(f"{VT_API_URL}/files", self._file_chunks(path), name)
+
+            if status == 429:
+                await self._requeue(msg, reply, doc_id, attempt)
+                return
+            if status != 200:
+                await utils.answer(msg, f"❌ VT Error: {data.get('error', {}).get('message')}")
+                return
+
+            msg = await utils.answer(msg, self.strings("scan_start") + self._format_heuristics(found))
+            self._track(data["data"]["id"], msg, doc_id, found)
         except Exception as e:
             logger.exception(e)
             await utils.answer(msg, f"❌ Ошибка: {str(e)}")
         finally:
-            if os.path.exists(path): os.remove(path)
+            if path and os.path.exists(path): os.remove(path)
+
+    async def _upload_large(self, reply, path: str, name: str) -> tuple:
+        """Файлы больше 32 МБ: скачивание из Telegram и загрузка на upload_url идут одновременно.
+
+        Хэш до конца скачивания неизвестен, поэтому поиск по SHA-256 здесь пропускается —
+        повторные пересылки все равно находятся в кэше по ID документа.
+        """
+        status, data = await self._vt_request("GET", f"{VT_API_URL}/files/upload_url")
+        if status != 200:
+            return status, data, None
+
+        pipe = asyncio.Queue(PIPE_CHUNKS)
+        download = asyncio.create_task(self._download(reply, path, pipe))
+        try:
+            status, data = await self._upload(data["data"], self._pipe_chunks(pipe), name)
+        finally:
+            # VT мог ответить, не дочитав тело, — тогда скачивание дальше не нужно
+            complete = download.done() and not download.cancelled() and download.exception() is None
+            download.cancel()
+            await asyncio.gather(download, return_exceptions=True)
+
+        return status, data, await self._heuristics(path, name) if complete else None
+
+    def _read_heuristics(self, path: str, name: str) -> Optional[List[str]]:
+        """Выполняется в executor: для больших архивов это заметная CPU-работа"""
+        if name.endswith(".py"):
+            with open(path, "r", encoding="utf-8", errors="ignore") as f:
+                return self._get_heuristics(f.read())
+
+        if not name.lower().endswith(ARCHIVE_SUFFIXES):
+            return None
+
+        found = []
+        try:
+            for member, findings in HEURISTICS.scan_archive(path):
+                found.extend(self._format_findings(findings, member))
+        except (zipfile.BadZipFile, tarfile.TarError, EOFError, OSError) as e:
+            logger.warning(f"Archive heuristics failed for {name}: {e}")
+            found.append(self.strings("h_archive_error"))
+
+        if len(found) > MAX_FINDINGS:
+            found = found[:MAX_FINDINGS] + [self.strings("h_more").format(len(found) - MAX_FINDINGS)]
+        return found
+
+    async def _heuristics(self, path: str, name: str) -> Optional[List[str]]:
+        return await asyncio.get_running_loop().run_in_executor(None, self._read_heuristics, path, name)
 
     @loader.command(ru_doc="Просмотреть код .py файла из ответа")
     async def getcodecmd(self, message: Message):
@@ -191,29 +809,27 @@ class VirusCheckMod(loader.Module):
             await utils.answer(message, self.strings("too_large").format(self.config["max_code_kb"]))
             return
 
-        code = (await reply.download_media(bytes)).decode("utf-8", errors="replace")
-        pages = [code[i:i+2000] for i in range(0, len(code), 2000)]
         session_id = f"{message.chat_id}_{message.id}"
-        self._sessions[session_id] = {"pages": pages, "name": reply.file.name}
+        self._sessions.put(session_id, CodeSession(reply.file.name, await reply.download_media(bytes)))
 
         await self._render_code(message, session_id, 0)
 
     async def _render_code(self, message_obj, session_id, page_index, call=None):
         session = self._sessions.get(session_id)
-        if not session:
+        if not session or page_index >= len(session):
             if call: await call.answer(self.strings("session_expired"), show_alert=True)
             else: await utils.answer(message_obj, self.strings("session_expired"))
             return
 
         text = (
-            self.strings("code_title").format(utils.escape_html(session["name"]), page_index + 1, len(session["pages"])) + 
-            f"\n\n<pre>{utils.escape_html(session['pages'][page_index])}</pre>"
+            self.strings("code_title").format(utils.escape_html(session.name), page_index + 1, len(session)) + 
+            f"\n\n<pre>{utils.escape_html(session.page(page_index))}</pre>"
         )
 
         buttons = []
         if page_index > 0:
             buttons.append({"text": "⬅️", "callback": self._pager, "args": (session_id, page_index - 1)})
-        if page_index < len(session["pages"]) - 1:
+        if page_index < len(session) - 1:
             buttons.append({"text": "➡️", "callback": self._pager, "args": (session_id, page_index + 1)})
         
         control_buttons = [{"text": "🚫 Закрыть", "action": "close"}]
@@ -0,0 +1,149 @@
+"""
+    Минимальная подмена окружения Hikka/Heroku для бенчмарков.
+
+    Модули репозитория импортируют `from .. import loader, utils` и `herokutl`,
+    поэтому вне юзербота их нельзя просто импортировать. load_module() регистрирует
+    упрощенные loader/utils/herokutl и загружает файл модуля как часть пакета-заглушки.
+    Здесь только то, что нужно бенчмаркам, — это не эмулятор Hikka.
+"""
+
+import html
+import importlib.util
+import sys
+import types
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+PACKAGE = "hisoka_bench"
+
+
+class Strings(dict):
+    def __call__(self, key):
+        return self[key]
+
+
+class ModuleConfig(dict):
+    def __init__(self, *values):
+        super().__init__((value.name, value.default) for value in values)
+
+
+class ConfigValue:
+    def __init__(self, name, default, doc=None, validator=None):
+        self.name = name
+        self.default = default
+
+
+class _Validators:
+    def __getattr__(self, name):
+        return lambda *args, **kwargs: None
+
+
+class Module:
+    strings = {}
+
+
+def tds(cls):
+    cls.strings = Strings(cls.strings)
+    return cls
+
+
+def _decorator(*args, **kwargs):
+    if len(args) == 1 and callable(args[0]) and not kwargs:
+        return args[0]
+    return lambda func: func
+
+
+async def answer(message, text, **kwargs):
+    return await message.edit(text)
+
+
+def get_args_raw(message):
+    return getattr(message, "raw_args", "")
+
+
+def get_chat_id(message):
+    return message.chat_id
+
+
+class FloodWaitError(Exception):
+    def __init__(self, request=None, capture=0, seconds=0):
+        super().__init__(f"A wait of {seconds} seconds is required")
+        self.seconds = seconds
+
+
+class _Stub:
+    """Класс-заглушка для типов herokutl, которые модули только упоминают"""
+
+    def __init__(self, *args, **kwargs):
+        self.args = args
+        self.__dict__.update(kwargs)
+
+
+def _stub_module(name: str, **attrs) -> types.ModuleType:
+    module = types.ModuleType(name)
+    module.__dict__.update(attrs)
+    module.__getattr__ = lambda attr: type(attr, (_Stub,), {})
+    sys.modules[name] = module
+    return module
+
+
+def _install():
+    if PACKAGE in sys.modules:
+        return
+
+    package = _stub_module(PACKAGE)
+    package.__path__ = []
+    modules = _stub_module(f"{PACKAGE}.modules")
+    modules.__path__ = []
+
+    package.loader = _stub_module(
+        f"{PACKAGE}.loader",
+        Module=Module,
+        ModuleConfig=ModuleConfig,
+        ConfigValue=ConfigValue,
+        validators=_Validators(),
+        tds=tds,
+        command=_decorator,
+        watcher=_decorator,
+        callback_handler=_decorator,
+    )
+    package.utils = _stub_module(
+        f"{PACKAGE}.utils",
+        answer=answer,
+        get_args_raw=get_args_raw,
+        get_chat_id=get_chat_id,
+        escape_html=lambda text: html.escape(str(text), quote=False),
+    )
+
+    herokutl = _stub_module("herokutl")
+    herokutl.__path__ = []
+    herokutl.types = _stub_module("herokutl.types", Message=object)
+    herokutl.errors = _stub_module("herokutl.errors", FloodWaitError=FloodWaitError)
+    # Остальные ошибки RPC модули только ловят, им достаточно быть исключениями
+    herokutl.errors.__getattr__ = lambda attr: type(attr, (Exception,), {})
+    herokutl.events = _stub_module("herokutl.events")
+    herokutl.utils = _stub_module("herokutl.utils")
+    herokutl.tl = _stub_module("herokutl.tl")
+    herokutl.tl.__path__ = []
+    herokutl.tl.types = _stub_module("herokutl.tl.types")
+
+
+def load_module(filename: str) -> types.ModuleType:
+    """Загружает файл модуля из корня репозитория (например, "VirusCheck.py")"""
+    _install()
+    name = f"{PACKAGE}.modules.{Path(filename).stem}"
+    spec = importlib.util.spec_from_file_location(name, ROOT / filename)
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[name] = module
+    spec.loader.exec_module(module)
+    return module
+
+
+class StubDB(dict):
+    """Хранилище модулей Hikka: db.get(owner, key, default) / db.set(owner, key, value)"""
+
+    def get(self, owner, key, default=None):
+        return super().get((owner, key), default)
+
+    def set(self, owner, key, value):
+        self[(owner, key)] = value
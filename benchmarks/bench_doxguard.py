@@ -0,0 +1,148 @@
+"""
+    Пропускная способность сканера DoxGuard: сообщений в секунду до и после.
+
+    "legacy" — прежняя логика watcher: re.search по строкам паттернов для телефона,
+    каждого other_ban и ФИО плюс пересчет цифр во всем тексте.
+    "scanner" — ChatMatcher профиля по умолчанию, собранный один раз.
+    Доля ложных срабатываний и пропусков считается на размеченном корпусе LABELLED.
+
+    python -m benchmarks.bench_doxguard --messages 20000
+"""
+
+import argparse
+import random
+import re
+import time
+
+from benchmarks._hikka import load_module
+
+CLEAN = [
+    "ок", "да", "нет, завтра", "кто идет вечером?", "лол 😂", "скинь ссылку плз",
+    "в 19:30 у входа", "версия 2.14.1 вышла", "заказ №4821 доставлен",
+    "Москва не сразу строилась", "привет всем, как дела?", "+1 к предыдущему",
+    "кстати, обновите клиент до 10.3", "вот тут подробно: https://example.com/docs",
+]
+PII = [
+    "мой номер +7 (999) 123-45-67 пиши",
+    "карта 4276 3800 1234 5679",
+    "паспорт 45 12 345678",
+    "заходи на 192.168.10.24",
+    "это Иванов Иван Иванович из 5Б",
+]
+
+# (текст, есть ли в нем ПДн): обычные номера, которые прежние паттерны принимали за карты, паспорта и IP
+LABELLED = [
+    ("заказ 4821 0093 1177 2040 оплачен", False),
+    ("трек-номер 1234 5678 9012 3456", False),
+    ("тикет 20 24 100500 закрыт", False),
+    ("сборка 10.3.12.400 уже в сторе", False),
+    ("версия 999.1.0.12", False),
+    ("ИНН организации 7707083893 00 12", False),
+    ("заказы 1234567 и 89001 и 4455667788991", False),
+    ("счет 40817810099910004312", False),
+    ("таймстемп 1717171717171717171", False),
+    ("в 19:30 у входа, билет 55", False),
+    ("карта 4276 3800 1234 5679", True),
+    ("карта 4111111111111111", True),
+    ("паспорт 45 12 345678", True),
+    ("заходи на 192.168.10.24", True),
+    ("мой номер 89991234567", True),
+    ("номер 8 999 123 45 67, звони", True),
+    ("номер 89991234567 и запасной 89997654321", True),
+    ("это Иванов Иван Иванович из 5Б", True),
+]
+
+
+def legacy_scan(text: str):
+    phone_pattern = r"(?:\+?\d[\s\-\(\)]?){10,15}"
+    other_ban = [
+        r"\b\d{4}[ -]?\d{4}[ -]?\d{4}[ -]?\d{4}\b",
+        r"\b\d{2}[ ]?\d{2}[ ]?\d{6}\b",
+        r"\b\d{1,3}\.\d{1,3}\.\d{1,3}\.\d{1,3}\b",
+    ]
+    fio_pattern = r"\b[А-ЯЁ][а-яёё]+\s+[А-ЯЁ][а-яёё]+(?:\s+[А-ЯЁ][а-яёё]+)?\b"
+
+    hit, mode = False, "mute"
+    if re.search(phone_pattern, text):
+        digits = "".join(filter(str.isdigit, text))
+        if 10 <= len(digits) <= 15:
+            hit, mode = True, "ban"
+    if not hit:
+        for pattern in other_ban:
+            if re.search(pattern, text):
+                hit, mode = True, "ban"
+                break
+    if not hit and re.search(fio_pattern, text):
+        hit, mode = True, "mute"
+    return hit, mode
+
+
+def corpus(count: int, pii_share: float, long_share: float, seed: int = 1) -> list:
+    rng = random.Random(seed)
+    messages = []
+    for _ in range(count):
+        roll = rng.random()
+        if roll < pii_share:
+            messages.append(rng.choice(PII))
+        elif roll < pii_share + long_share:
+            messages.append(" ".join(rng.choice(CLEAN) for _ in range(200))[:4096])
+        else:
+            messages.append(rng.choice(CLEAN))
+    return messages
+
+
+def error_rates(name: str, hit) -> None:
+    clean = [text for text, pii in LABELLED if not pii]
+    dirty = [text for text, pii in LABELLED if pii]
+    false_positives = sum(bool(hit(text)) for text in clean)
+    false_negatives = sum(not hit(text) for text in dirty)
+    print(
+        f"{name:<10}false positives {false_positives}/{len(clean)} ({false_positives / len(clean):.0%}), "
+        f"misses {false_negatives}/{len(dirty)} ({false_negatives / len(dirty):.0%})"
+    )
+
+
+def measure(name: str, scan, messages: list) -> float:
+    started = time.perf_counter()
+    for text in messages:
+        scan(text)
+    rate = len(messages) / (time.perf_counter() - started)
+    print(f"{name:<10}{rate:>12,.0f} msg/s")
+    return rate
+
+
+def main():
+    parser = argparse.ArgumentParser(description="DoxGuard scanner throughput, before and after")
+    parser.add_argument("--messages", type=int, default=20000)
+    parser.add_argument("--pii", type=float, default=0.05, help="share of messages containing PII")
+    parser.add_argument("--long", type=float, default=0.05, help="share of ~4 KB messages")
+    args = parser.parse_args()
+
+    dox = load_module("DoxGuard.py")
+    scanner = dox.ChatMatcher({})
+    messages = corpus(args.messages, args.pii, args.long)
+
+    mismatches = sum(
+        legacy_scan(text) != (bool(hits := scanner.scan(text)), scanner.verdict(hits) or "mute")
+        for text in messages
+    )
+    print(f"{len(messages)} messages, verdicts differing from legacy: {mismatches}")
+
+    # Профиль, где включен только телефон: досмотр без телефона собирать не из чего
+    phone_only = dox.ChatMatcher({"actions": {c: "off" for c in dox.CATEGORY_MODES if c != "phone"}})
+    texts = messages + [text for text, _ in LABELLED] + ["123456789012345678"]
+    stray = sum(
+        phone_only.verdict(hits := phone_only.scan(text)) not in (None, "ban")
+        or any(hit.category != "phone" for hit in hits)
+        for text in texts
+    )
+    print(f"phone-only profile, non-phone verdicts: {stray}")
+    error_rates("legacy", lambda text: legacy_scan(text)[0])
+    error_rates("scanner", scanner.scan)
+    before = measure("legacy", legacy_scan, messages)
+    after = measure("scanner", scanner.scan, messages)
+    print(f"speedup   {after / before:>12.2f}x")
+
+
+if __name__ == "__main__":
+    main()
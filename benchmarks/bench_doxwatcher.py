@@ -0,0 +1,145 @@
+"""
+    Пропускная способность DoxGuardMod.watcher на синтетическом логе чатов.
+
+    Лог смешивает чистые сообщения, ПДн, повторы и длинные враждебные строки и прогоняется
+    через watcher с заглушками клиента и БД. API-вызовы заглушки занимают --api-latency секунд,
+    доля --flood из них отвечает FloodWait. Выводит сообщений в секунду, долю времени
+    на регулярки и на API, задержку наказания и счетчики из DoxGuardMod.stats.
+
+    python -m benchmarks.bench_doxwatcher --messages 20000 --chats 20
+"""
+
+import argparse
+import asyncio
+import logging
+import random
+import time
+import types
+from collections import Counter
+
+from benchmarks._hikka import FloodWaitError, StubDB, load_module
+from benchmarks.bench_doxguard import CLEAN, PII
+
+ADVERSARIAL = [
+    "1 " * 2000,
+    "Аа " * 1300,
+    "+7-" * 1300,
+    "1.1." * 1000,
+    "Иванов " * 580,
+]
+
+
+class StubClient:
+    def __init__(self, latency: float, flood: float, seed: int = 1):
+        self.latency = latency
+        self.flood = flood
+        self.calls = Counter()
+        self._rng = random.Random(seed)
+
+    async def _api(self, name: str):
+        self.calls[name] += 1
+        await asyncio.sleep(self.latency)
+        if self._rng.random() < self.flood:
+            raise FloodWaitError(seconds=0)
+
+    async def get_me(self):
+        return types.SimpleNamespace(id=1)
+
+    def add_event_handler(self, *args):
+        pass
+
+    def remove_event_handler(self, *args):
+        pass
+
+    async def get_participants(self, chat, filter=None):
+        await self._api("get_participants")
+        return [types.SimpleNamespace(id=2)]
+
+    async def delete_messages(self, chat, ids):
+        await self._api("delete_messages")
+
+    async def edit_permissions(self, chat, user_id, **kwargs):
+        await self._api("edit_permissions")
+
+    async def send_message(self, chat, text):
+        await self._api("send_message")
+
+
+def chat_log(count: int, chats: int, pii: float, adversarial: float, seed: int = 1) -> list:
+    rng = random.Random(seed)
+    log = []
+    for msg_id in range(1, count + 1):
+        roll = rng.random()
+        if roll < pii:
+            text = rng.choice(PII)
+        elif roll < pii + adversarial:
+            text = rng.choice(ADVERSARIAL)
+        else:
+            text = rng.choice(CLEAN)
+        sender = rng.randrange(100, 1100)
+        log.append(types.SimpleNamespace(
+            chat_id=-1000 - rng.randrange(chats),
+            id=msg_id,
+            raw_text=text,
+            entities=None,
+            is_private=False,
+            is_group=True,
+            sender_id=sender,
+            sender=types.SimpleNamespace(id=sender, first_name="User"),
+        ))
+    return log
+
+
+async def run(args):
+    logging.disable(logging.WARNING)
+    dox = load_module("DoxGuard.py")
+    client = StubClient(args.api_latency, args.flood)
+    log = chat_log(args.messages, args.chats, args.pii, args.adversarial)
+    db = StubDB()
+    db.set("DoxGuard", "active_chats", sorted({message.chat_id for message in log}))
+
+    mod = dox.DoxGuardMod()
+    await mod.client_ready(client, db)
+
+    started = time.perf_counter()
+    for message in log:
+        await mod.watcher(message)
+    watcher_time = time.perf_counter() - started
+    while mod.punishments._workers:
+        await asyncio.sleep(0.01)
+    drained = time.perf_counter() - started
+    await mod.on_unload()
+
+    stats = list(mod.stats.values())
+    scan_time = sum(chat.scan_time for chat in stats)
+    api_time = sum(chat.api_time for chat in stats)
+    latencies = sorted(latency for chat in stats for latency in chat.punish_latency)
+    hits = sum((chat.hits for chat in stats), Counter())
+    errors = sum((chat.api_errors for chat in stats), Counter())
+
+    print(f"messages:         {args.messages} in {args.chats} chats")
+    print(f"watcher:          {args.messages / watcher_time:,.0f} msg/s ({watcher_time:.2f} s)")
+    print(f"until drained:    {drained:.2f} s")
+    print(f"regex time:       {scan_time:.2f} s ({scan_time / watcher_time:.0%} of watcher time)")
+    print(f"API time:         {api_time:.2f} s (summed over {len(stats)} chat queues, FloodWait sleeps excluded)")
+    if latencies:
+        print(f"punish p50/p99:   {latencies[len(latencies) // 2]:.3f} / {latencies[int(len(latencies) * 0.99)]:.3f} s")
+    print(f"messages hit:     {dict(hits.most_common())}")
+    print(f"API calls:        {dict(client.calls.most_common())}")
+    print(f"API errors:       {dict(errors.most_common())}")
+    print(f"verdict cache:    {mod.verdicts.hits}/{mod.verdicts.misses}, scan fallbacks: {dict(mod.scan_stats)}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Replay a synthetic chat log through DoxGuardMod.watcher")
+    parser.add_argument("--messages", type=int, default=20000)
+    parser.add_argument("--chats", type=int, default=20)
+    parser.add_argument("--pii", type=float, default=0.05, help="share of messages containing PII")
+    parser.add_argument("--adversarial", type=float, default=0.01, help="share of long adversarial messages")
+    parser.add_argument("--api-latency", type=float, default=0.05, help="seconds per stub API call")
+    parser.add_argument("--flood", type=float, default=0.02, help="share of API calls answering FloodWait")
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
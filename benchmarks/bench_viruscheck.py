@@ -0,0 +1,180 @@
+"""
+    Нагрузочный тест VirusCheck.scanfilecmd против локальной подмены VirusTotal.
+
+    N сканирований запускаются одновременно через заглушки Telegram-объектов.
+    Скан считается завершенным, когда в его статусном сообщении появился отчет, и неудачным,
+    когда там ошибка, исчерпанная квота или таймаут анализа.
+    Выводит задержку от команды до итога, число неудач и API-вызовов на скан.
+
+    python -m benchmarks.bench_viruscheck --scans 50 --rate 600 --duplicates 0.3
+"""
+
+import argparse
+import asyncio
+import math
+import os
+import random
+import statistics
+import tempfile
+import time
+from collections import Counter
+from pathlib import Path
+
+from benchmarks._hikka import StubDB, load_module
+from benchmarks.vt_fake import FakeVirusTotal
+
+
+class StubMessage:
+    def __init__(self, client, chat_id: int, msg_id: int, reply=None):
+        self.client = client
+        self.chat_id = chat_id
+        self.id = msg_id
+        self.reply = reply
+        self.raw_args = ""
+        self.text = ""
+        client.messages[(chat_id, msg_id)] = self
+
+    async def get_reply_message(self):
+        return self.reply
+
+    async def edit(self, text):
+        self.text = text
+        self.client.on_edit(self)
+        return self
+
+
+class StubDocument:
+    def __init__(self, doc_id: int, data: bytes, name: str):
+        self.id = doc_id
+        self.data = data
+        self.name = name
+        self.size = len(data)
+
+
+class StubReply:
+    def __init__(self, document: StubDocument):
+        self.media = document
+        self.document = document
+        self.file = document
+
+
+class StubClient:
+    def __init__(self, report_marker: str, failure_markers: tuple):
+        self.messages = {}
+        self.report_marker = report_marker
+        self.failure_markers = failure_markers
+        self.done = {}
+        self.failures = {}
+        self._waiters = {}
+
+    async def iter_download(self, media, chunk_size: int):
+        for offset in range(0, len(media.data), chunk_size):
+            await asyncio.sleep(0)
+            yield media.data[offset:offset + chunk_size]
+
+    async def download_media(self, media, file=None):
+        return media.data
+
+    async def edit_message(self, chat_id, msg_id, text, **kwargs):
+        return await self.messages[(chat_id, msg_id)].edit(text)
+
+    def on_edit(self, message: StubMessage):
+        if message.chat_id in self.done:
+            return
+        failed = message.text.startswith(self.failure_markers)
+        if failed or message.text.startswith(self.report_marker):
+            self.done[message.chat_id] = time.perf_counter()
+            if failed:
+                self.failures[message.chat_id] = message.text
+            if message.chat_id in self._waiters:
+                self._waiters.pop(message.chat_id).set()
+
+    async def wait_done(self, chat_id: int):
+        if chat_id not in self.done:
+            self._waiters[chat_id] = event = asyncio.Event()
+            await event.wait()
+
+
+def _payloads(count: int, duplicates: float, size: int) -> list:
+    unique = [os.urandom(size) for _ in range(max(1, round(count * (1 - duplicates))))]
+    return unique + [random.choice(unique) for _ in range(count - len(unique))]
+
+
+async def run(args):
+    vc = load_module("VirusCheck.py")
+    workdir = tempfile.TemporaryDirectory()
+    vc.CACHE_PATH = Path(workdir.name) / "reports.sqlite3"
+    vc.POLL_BASE_DELAY = args.poll_base
+    vc.POLL_MAX_DELAY = args.poll_max
+
+    fake = FakeVirusTotal(args.latency, args.analysis_duration, per_minute=args.vt_per_minute)
+    await fake.start()
+    vc.VT_API_URL = f"{fake.url}/api/v3"
+
+    mod = vc.VirusCheckMod()
+    mod.config["vt_api_key"] = "benchmark"
+    mod.config["vt_rate_limit"] = args.rate
+    mod.config["vt_daily_quota"] = 0
+    # Ошибки и исчерпанная квота начинаются с ❌, таймаут анализа — с ⚠️
+    client = StubClient(mod.strings("vt_report")[:2], (mod.strings("quota_exceeded")[:1], mod.strings("scan_timeout")[:2]))
+
+    commands = []
+    for index, data in enumerate(_payloads(args.scans, args.duplicates, args.size)):
+        chat_id = index + 1
+        reply = StubReply(StubDocument(10_000 + index, data, f"sample_{index}.py"))
+        commands.append(StubMessage(client, chat_id, 1, reply))
+
+    try:
+        await mod.client_ready(client, StubDB())
+        started = time.perf_counter()
+        await asyncio.gather(*(mod.scanfilecmd(message) for message in commands))
+        try:
+            await asyncio.wait_for(
+                asyncio.gather(*(client.wait_done(message.chat_id) for message in commands)),
+                args.timeout,
+            )
+        except asyncio.TimeoutError:
+            pass
+        elapsed = time.perf_counter() - started
+    finally:
+        await mod.on_unload()
+        await fake.stop()
+        workdir.cleanup()
+
+    finished = [message for message in commands if message.chat_id in client.done]
+    latencies = sorted(client.done[message.chat_id] - started for message in finished)
+    total_calls = sum(fake.calls.values())
+    print(f"scans:            {args.scans} ({args.duplicates:.0%} duplicates, {args.size} bytes each)")
+    print(f"wall time:        {elapsed:.2f} s")
+    print(f"failed:           {len(client.failures)}")
+    for text, count in Counter(text.split("\n")[0] for text in client.failures.values()).most_common():
+        print(f"  {count:<4}{text}")
+    print(f"unfinished:       {len(commands) - len(finished)} (after --timeout {args.timeout:g} s)")
+    if latencies:
+        print(f"latency p50:      {statistics.median(latencies):.2f} s")
+        print(f"latency p95:      {latencies[math.ceil(len(latencies) * 0.95) - 1]:.2f} s")
+        print(f"latency max:      {latencies[-1]:.2f} s")
+    print(f"API calls:        {total_calls} ({total_calls / args.scans:.2f} per scan)")
+    for endpoint, count in sorted(fake.calls.items()):
+        print(f"  {endpoint:<22}{count}")
+    print(f"quota errors:     {fake.quota_errors}")
+    print(f"cache hits/miss:  {mod._cache.hits}/{mod._cache.misses}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark VirusCheck.scanfilecmd against a fake VirusTotal")
+    parser.add_argument("--scans", type=int, default=20)
+    parser.add_argument("--duplicates", type=float, default=0.25, help="share of scans that repeat earlier content")
+    parser.add_argument("--size", type=int, default=64 * 1024, help="payload size in bytes")
+    parser.add_argument("--rate", type=int, default=600, help="module vt_rate_limit (requests per minute)")
+    parser.add_argument("--vt-per-minute", type=int, default=0, help="fake VT quota per minute (0 = unlimited)")
+    parser.add_argument("--latency", type=float, default=0.05)
+    parser.add_argument("--analysis-duration", type=float, default=1.0)
+    parser.add_argument("--poll-base", type=float, default=0.25, help="override POLL_BASE_DELAY")
+    parser.add_argument("--poll-max", type=float, default=2.0, help="override POLL_MAX_DELAY")
+    parser.add_argument("--timeout", type=float, default=600)
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,199 @@
+"""
+    Локальная подмена VirusTotal API v3 для нагрузочных тестов VirusCheck.
+
+    Реализует только эндпоинты, которые использует модуль:
+    POST /api/v3/files, GET /api/v3/files/upload_url, POST /upload/{token},
+    GET /api/v3/files/{id} и GET /api/v3/analyses/{id}.
+
+    Запуск отдельно: python -m benchmarks.vt_fake --port 8080 --latency 0.2
+"""
+
+import argparse
+import asyncio
+import hashlib
+import random
+import time
+import uuid
+from collections import Counter, deque
+
+from aiohttp import web
+
+
+class FakeVirusTotal:
+    def __init__(
+        self,
+        latency: float = 0.05,
+        analysis_duration: float = 1.0,
+        per_minute: int = 0,
+        per_day: int = 0,
+        malicious_rate: float = 0.1,
+    ):
+        self.latency = latency
+        self.analysis_duration = analysis_duration
+        self.per_minute = per_minute
+        self.per_day = per_day
+        self.malicious_rate = malicious_rate
+        self.calls = Counter()
+        self.quota_errors = 0
+        self.url = None
+
+        self._minute = deque()
+        self._day = 0
+        self._files = {}
+        self._analyses = {}
+        self._upload_tokens = set()
+        self._runner = None
+
+        self.app = web.Application(client_max_size=1024 ** 3)
+        self.app.router.add_post("/api/v3/files", self._post_file)
+        self.app.router.add_get("/api/v3/files/upload_url", self._upload_url)
+        self.app.router.add_get("/api/v3/files/{id}", self._get_file)
+        self.app.router.add_get("/api/v3/analyses/{id}", self._get_analysis)
+        self.app.router.add_post("/upload/{token}", self._post_upload)
+
+    async def start(self, host: str = "127.0.0.1", port: int = 0) -> str:
+        self._runner = web.AppRunner(self.app)
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, host, port)
+        await site.start()
+        port = site._server.sockets[0].getsockname()[1]
+        self.url = f"http://{host}:{port}"
+        return self.url
+
+    async def stop(self):
+        if self._runner:
+            await self._runner.cleanup()
+
+    @staticmethod
+    def _error(status: int, code: str, message: str) -> web.Response:
+        return web.json_response({"error": {"code": code, "message": message}}, status=status)
+
+    async def _enter(self, endpoint: str):
+        """Учет вызова, квоты и искусственная задержка. Возвращает ответ с ошибкой или None"""
+        self.calls[endpoint] += 1
+        await asyncio.sleep(self.latency)
+
+        now = time.monotonic()
+        while self._minute and now - self._minute[0] > 60:
+            self._minute.popleft()
+        if (self.per_minute and len(self._minute) >= self.per_minute) or (self.per_day and self._day >= self.per_day):
+            self.quota_errors += 1
+            return self._error(429, "QuotaExceededError", "Quota exceeded")
+        self._minute.append(now)
+        self._day += 1
+        return None
+
+    async def _receive(self, request: web.Request) -> web.Response:
+        reader = await request.multipart()
+        part = await reader.next()
+        if part is None or part.name != "file":
+            return self._error(400, "BadRequestError", "No file")
+
+        digest = hashlib.sha256()
+        while chunk := await part.read_chunk():
+            digest.update(chunk)
+        sha256 = digest.hexdigest()
+
+        analysis_id = uuid.uuid4().hex
+        self._analyses[analysis_id] = (sha256, time.monotonic() + self.analysis_duration)
+        return web.json_response({"data": {"type": "analysis", "id": analysis_id}})
+
+    def _stats(self, sha256: str) -> dict:
+        if sha256 not in self._files:
+            malicious = random.randint(1, 30) if random.random() < self.malicious_rate else 0
+            self._files[sha256] = {
+                "malicious": malicious,
+                "suspicious": 0,
+                "undetected": 70 - malicious,
+                "harmless": 0,
+                "timeout": 0,
+                "type-unsupported": 5,
+                "failure": 0,
+                "confirmed-timeout": 0,
+            }
+        return self._files[sha256]
+
+    async def _post_file(self, request: web.Request) -> web.Response:
+        return await self._enter("POST /files") or await self._receive(request)
+
+    async def _upload_url(self, request: web.Request) -> web.Response:
+        error = await self._enter("GET /files/upload_url")
+        if error:
+            return error
+        token = uuid.uuid4().hex
+        self._upload_tokens.add(token)
+        return web.json_response({"data": f"{self.url}/upload/{token}"})
+
+    async def _post_upload(self, request: web.Request) -> web.Response:
+        self.calls["POST upload_url"] += 1
+        token = request.match_info["token"]
+        if token not in self._upload_tokens:
+            return self._error(400, "BadRequestError", "Invalid upload URL")
+        self._upload_tokens.discard(token)
+        return await self._receive(request)
+
+    async def _get_file(self, request: web.Request) -> web.Response:
+        error = await self._enter("GET /files/{id}")
+        if error:
+            return error
+        sha256 = request.match_info["id"]
+        if sha256 not in self._files:
+            return self._error(404, "NotFoundError", f"File \"{sha256}\" not found")
+        return web.json_response({
+            "data": {
+                "type": "file",
+                "id": sha256,
+                "attributes": {
+                    "last_analysis_stats": self._files[sha256],
+                    "last_analysis_date": int(time.time()),
+                },
+            }
+        })
+
+    async def _get_analysis(self, request: web.Request) -> web.Response:
+        error = await self._enter("GET /analyses/{id}")
+        if error:
+            return error
+        analysis_id = request.match_info["id"]
+        if analysis_id not in self._analyses:
+            return self._error(404, "NotFoundError", f"Analysis \"{analysis_id}\" not found")
+
+        sha256, done_at = self._analyses[analysis_id]
+        completed = time.monotonic() >= done_at
+        return web.json_response({
+            "data": {
+                "type": "analysis",
+                "id": analysis_id,
+                "attributes": {
+                    "status": "completed" if completed else "queued",
+                    "stats": self._stats(sha256) if completed else {},
+                    "date": int(time.time()),
+                },
+            },
+            "meta": {"file_info": {"sha256": sha256}},
+        })
+
+
+async def _serve(args):
+    fake = FakeVirusTotal(args.latency, args.analysis_duration, args.per_minute, args.per_day)
+    url = await fake.start(args.host, args.port)
+    print(f"Fake VirusTotal listening on {url}/api/v3")
+    try:
+        await asyncio.Event().wait()
+    finally:
+        await fake.stop()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Local VirusTotal v3 stand-in")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("--latency", type=float, default=0.05, help="seconds added to every API call")
+    parser.add_argument("--analysis-duration", type=float, default=1.0, help="seconds until an analysis completes")
+    parser.add_argument("--per-minute", type=int, default=0, help="429 after N calls per minute (0 = unlimited)")
+    parser.add_argument("--per-day", type=int, default=0, help="429 after N calls in total (0 = unlimited)")
+    asyncio.run(_serve(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()